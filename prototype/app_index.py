@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QFileSystemWatcher, pyqtSignal
+from importer import read_desktop_entry, is_launchable
+from fuzzy_index import FuzzyIndex
+from write_behind import atomic_write
+from tracing import traced
+
+CACHE_VERSION = 1
+ICON_SIZES = ('48x48', '64x64', '32x32', '128x128', '256x256', '24x24', 'scalable')
+ICON_EXTENSIONS = ('.png', '.xpm', '.svg')
+SEARCH_LIMIT = 20
+
+
+def data_dirs():
+    home = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+    system = os.environ.get('XDG_DATA_DIRS') or '/usr/local/share:/usr/share'
+    dirs = []
+    for d in [home] + system.split(':'):
+        if d and d not in dirs:
+            dirs.append(d)
+    return dirs
+
+
+def application_dirs():
+    return [os.path.join(d, 'applications') for d in data_dirs()]
+
+
+def default_cache_file():
+    cache = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache, 'quickball', 'applications.json')
+
+
+def resolve_icon(name):
+    # Icon= is usually a theme name; look for it in hicolor and pixmaps.
+    if not name:
+        return None
+    if os.path.isabs(name):
+        return name if os.path.exists(name) else None
+    for base in data_dirs():
+        for size in ICON_SIZES:
+            for ext in ICON_EXTENSIONS:
+                path = os.path.join(base, 'icons', 'hicolor', size, 'apps', name + ext)
+                if os.path.exists(path):
+                    return path
+        for ext in ICON_EXTENSIONS:
+            path = os.path.join(base, 'pixmaps', name + ext)
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def load_cache(path):
+    try:
+        with open(path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('version') != CACHE_VERSION:
+        return {}
+    return cache.get('files', {})
+
+
+def scan(dirs, cached):
+    # Files whose mtime matches the cache are not opened again. A desktop
+    # file ID (its path below applications/, '/' -> '-') belongs to the
+    # first directory that has it, so a user's copy hides the system one.
+    files = {}
+    claimed = set()
+    apps = []
+    parsed = 0
+    for base in dirs:
+        for root, subdirs, names in os.walk(base):
+            subdirs.sort()
+            for name in sorted(names):
+                if not name.endswith('.desktop'):
+                    continue
+                path = os.path.join(root, name)
+                desktop_id = os.path.relpath(path, base).replace(os.sep, '-')
+                if desktop_id in claimed:
+                    continue
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                claimed.add(desktop_id)
+                old = cached.get(path)
+                if old is not None and old[0] == mtime:
+                    app = old[1]
+                else:
+                    try:
+                        entry = read_desktop_entry(path)
+                    except OSError:
+                        continue
+                    parsed += 1
+                    app = None
+                    if is_launchable(entry):
+                        app = {'name': entry['Name'], 'path': path, 'icon': entry.get('Icon', '')}
+                files[path] = [mtime, app]
+                if app is not None:
+                    apps.append(app)
+    return apps, files, parsed
+
+
+class ScanTask(QRunnable):
+    def __init__(self, app_index):
+        super().__init__()
+        self.app_index = app_index
+
+    @traced('scan_applications')
+    def run(self):
+        cache_file = self.app_index.cache_file
+        cached = load_cache(cache_file)
+        apps, files, parsed = scan(self.app_index.dirs, cached)
+        if parsed or files.keys() != cached.keys():
+            try:
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                atomic_write(cache_file, json.dumps({'version': CACHE_VERSION, 'files': files}))
+            except OSError as e:
+                print(f"Could not write {cache_file}: {e}", file=sys.stderr)
+        self.app_index.scanned.emit(apps, FuzzyIndex(apps), parsed)
+
+
+class AppIndex(QObject):
+    # Emitted from the scan worker, delivered queued on the GUI thread.
+    scanned = pyqtSignal(list, object, int)
+    ready = pyqtSignal()
+
+    def __init__(self, dirs=None, cache_file=None, parent=None):
+        super().__init__(parent)
+        self.dirs = dirs if dirs is not None else application_dirs()
+        self.cache_file = cache_file or default_cache_file()
+        self.apps = None
+        self.index = None
+        self.parsed = 0
+        self.loading = False
+        self.stale = True
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.scanned.connect(self.on_scanned)
+
+        # Installs and removals touch the applications directories; until one
+        # does, searches are answered from memory without a rescan.
+        self.watcher = QFileSystemWatcher(self)
+        existing = [d for d in self.dirs if os.path.isdir(d)]
+        if existing:
+            self.watcher.addPaths(existing)
+        self.watcher.directoryChanged.connect(self.invalidate)
+
+    def invalidate(self, _path=None):
+        self.stale = True
+
+    def load(self):
+        if self.stale and not self.loading:
+            self.stale = False
+            self.loading = True
+            self.pool.start(ScanTask(self))
+
+    def on_scanned(self, apps, index, parsed):
+        self.apps = sorted(apps, key=lambda a: a['name'].lower())
+        self.index = index
+        self.parsed = parsed
+        self.loading = False
+        self.ready.emit()
+
+    def is_ready(self):
+        return self.index is not None
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        if self.index is None:
+            return []
+        if not query.strip():
+            return self.apps[:limit]
+        return self.index.search(query, limit)
+
+
+_app_index = None
+
+
+def get_app_index():
+    global _app_index
+    if _app_index is None:
+        _app_index = AppIndex()
+    return _app_index
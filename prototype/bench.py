@@ -0,0 +1,993 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import platform
+import subprocess
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QEvent, QT_VERSION_STR
+
+# Every number recorded here is lower-is-better, keyed benchmark -> metric.
+RESULTS = {}
+# A metric regresses when it is this much worse than the baseline, relatively
+# and absolutely (the floor keeps sub-millisecond jitter out of the report).
+# Repeated runs of identical code differ by up to a third (mostly fsync).
+TOLERANCE = 0.5
+NOISE_FLOOR = 1.0
+
+
+def record(benchmark, metric, value):
+    RESULTS.setdefault(benchmark, {})[metric] = round(value, 3)
+
+
+def rss_kb():
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def make_shortcuts(count):
+    return [{'name': f'Shortcut {i}', 'path': f'/usr/bin/app{i}', 'icon': os.path.join('icons', 'default.png')}
+            for i in range(count)]
+
+
+def soak_panel(app, iterations=10000, warmup=1000, shortcuts=200, max_growth_kb=2048):
+    import test5
+
+    with open(test5.SHORTCUTS_FILE, 'w') as f:
+        json.dump(make_shortcuts(shortcuts), f)
+    ball = test5.QuickBall()
+    ball.show()
+
+    for i in range(warmup + iterations):
+        if i == warmup:
+            baseline = rss_kb()
+        ball.toggle_panel()
+        app.processEvents()
+        ball.toggle_panel()
+        app.processEvents()
+    growth = rss_kb() - baseline
+    record('soak_panel', 'rss_growth_kb', growth)
+
+    print(f'soak_panel: {iterations} open/close cycles, rss growth {growth} kB (limit {max_growth_kb} kB)')
+    return growth <= max_growth_kb
+
+
+def panel_scaling(app, sizes=(500, 50000), max_ratio=3.0):
+    import test5
+    from shortcut_panel import ShortcutPanel
+    from shortcut_store import ShortcutStore
+
+    ball = test5.QuickBall()
+    timings = {}
+    for count in sizes:
+        path = f'scaling-{count}.json'
+        with open(path, 'w') as f:
+            json.dump(make_shortcuts(count), f)
+        store = ShortcutStore(path)
+        store.get()
+        store.finish_indexing()
+
+        start = time.perf_counter()
+        panel = ShortcutPanel(store, ball)
+        panel.show()
+        app.processEvents()
+        bar = panel.list_view.verticalScrollBar()
+        for step in range(50):
+            bar.setValue(bar.maximum() * step // 49)
+            app.processEvents()
+        timings[count] = time.perf_counter() - start
+        panel.close()
+        panel.deleteLater()
+        app.processEvents()
+
+    for count, seconds in timings.items():
+        record('panel_scaling', f'{count}/open_scroll_ms', seconds * 1000)
+        print(f'panel_scaling: {count} shortcuts open+scroll {seconds * 1000:.1f} ms')
+    return timings[sizes[-1]] <= timings[sizes[0]] * max_ratio
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+
+def best_of(func, repeat, setup=None):
+    best = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        ms = timed(func)
+        best = ms if best is None else min(best, ms)
+    return best
+
+
+def storage_backends(app, sizes=(1000, 10000, 100000)):
+    from storage import JsonBackend, SqliteBackend
+
+    for count in sizes:
+        for backend_class, path in ((JsonBackend, f'backend-{count}.json'), (SqliteBackend, f'backend-{count}.db')):
+            backend = backend_class(path)
+            shortcuts = make_shortcuts(count)
+            backend.save_all(shortcuts)
+            backend.flush()
+
+            results = {'load': timed(backend.load)}
+            middle = count // 2
+
+            def insert():
+                shortcuts.insert(middle, {'name': 'new', 'path': '/usr/bin/new'})
+                backend.insert(shortcuts, middle)
+                backend.flush()
+
+            def update():
+                shortcuts[middle] = {'name': 'edited', 'path': '/usr/bin/edited'}
+                backend.update(shortcuts, middle)
+                backend.flush()
+
+            def delete():
+                del shortcuts[middle]
+                backend.delete(shortcuts, middle)
+                backend.flush()
+
+            def move():
+                shortcuts.append(shortcuts.pop(10))
+                backend.move(shortcuts, 10, 1, count - 1)
+                backend.flush()
+
+            for name, func in (('insert', insert), ('update', update), ('delete', delete), ('move', move)):
+                results[name] = timed(func)
+            backend.close()
+            for name, ms in results.items():
+                record('storage_backends', f'{backend_class.__name__}/{count}/{name}_ms', ms)
+            row = ' '.join(f'{name} {ms:8.2f} ms' for name, ms in results.items())
+            print(f'storage_backends: {backend_class.__name__:13} {count:6} {row}')
+    return True
+
+
+def idle_wakeups(app, seconds=60, settle_ms=1000):
+    from PyQt5.QtCore import QObject, QEvent, QElapsedTimer
+    import test5
+
+    class TimerCounter(QObject):
+        count = 0
+
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Timer:
+                TimerCounter.count += 1
+            return False
+
+    ball = test5.QuickBall()
+    ball.idle_timer.setInterval(100)
+    ball.show()
+    # Opened and closed once, as after any real use: a hidden panel must not
+    # keep anything ticking either.
+    ball.toggle_panel()
+    app.processEvents()
+    ball.toggle_panel()
+
+    # Let the ball fade out first; after that an idle ball should do nothing.
+    clock = QElapsedTimer()
+    clock.start()
+    while clock.elapsed() < settle_ms:
+        app.processEvents()
+    counter = TimerCounter()
+    app.installEventFilter(counter)
+    clock.restart()
+    while clock.elapsed() < seconds * 1000:
+        app.processEvents()
+        time.sleep(0.05)
+    app.removeEventFilter(counter)
+    record('idle_wakeups', 'timer_events', TimerCounter.count)
+
+    print(f'idle_wakeups: {TimerCounter.count} timer events in {seconds} s idle, '
+          f'opacity {ball.windowOpacity():.2f}')
+    ball.close()
+    return TimerCounter.count == 0
+
+
+def drag_paint(app, frames=2000):
+    from PyQt5.QtGui import QPainter, QColor
+    from PyQt5.QtCore import Qt
+    import test5
+
+    # The paint path before sprites: antialiased ellipse on every repaint.
+    class DirectBall(test5.QuickBall):
+        def paintEvent(self, event):
+            painter = QPainter(self)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setBrush(QColor(0, 122, 204, 220))
+            painter.setPen(Qt.NoPen)
+            painter.drawEllipse(0, 0, self.width(), self.height())
+
+    results = {}
+    for label, ball_class in (('direct', DirectBall), ('sprite', test5.QuickBall)):
+        ball = ball_class()
+        ball.show()
+        app.processEvents()
+        start = time.perf_counter()
+        for i in range(frames):
+            ball.move(100 + i % 400, 100 + (i * 7) % 300)
+            ball.repaint()
+        results[label] = (time.perf_counter() - start) * 1000 / frames
+        ball.close()
+        app.processEvents()
+
+    record('drag_paint', 'direct_us', results['direct'] * 1000)
+    record('drag_paint', 'sprite_us', results['sprite'] * 1000)
+    print(f"drag_paint: {frames} synthetic drag frames, direct {results['direct'] * 1000:.1f} us/frame, "
+          f"sprite {results['sprite'] * 1000:.1f} us/frame")
+    return True
+
+
+def drag_input(app, rate_hz=1000, seconds=2.0):
+    from PyQt5.QtGui import QMouseEvent
+    from PyQt5.QtCore import Qt, QObject, QEvent, QPoint, QPointF
+    import test5
+
+    class MoveCounter(QObject):
+        count = 0
+
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Move:
+                self.count += 1
+            return False
+
+    # The drag path before coalescing: one window move per mouse event.
+    class EveryEventBall(test5.QuickBall):
+        def mouseMoveEvent(self, event):
+            if self.dragging:
+                self.move(event.globalPos() - self.drag_start_pos)
+
+    def mouse(kind, pos, buttons):
+        return QMouseEvent(kind, QPointF(40, 40), QPointF(pos), Qt.LeftButton, buttons, Qt.NoModifier)
+
+    results = {}
+    for label, ball_class in (('every_event', EveryEventBall), ('coalesced', test5.QuickBall)):
+        ball = ball_class()
+        ball.show()
+        app.processEvents()
+        counter = MoveCounter()
+        ball.installEventFilter(counter)
+        start = QPoint(140, 140)
+        app.sendEvent(ball, mouse(QEvent.MouseButtonPress, start, Qt.LeftButton))
+        events = int(rate_hz * seconds)
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        for i in range(events):
+            app.sendEvent(ball, mouse(QEvent.MouseMove, start + QPoint(i % 600, (i * 3) % 400), Qt.LeftButton))
+            app.processEvents()
+            delay = wall + (i + 1) / rate_hz - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        app.sendEvent(ball, mouse(QEvent.MouseButtonRelease, start + QPoint(300, 200), Qt.NoButton))
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+        results[label] = (cpu, counter.count, wall)
+        ball.close()
+        ball.deleteLater()
+        app.sendPostedEvents(None, QEvent.DeferredDelete)
+
+    for label, (cpu, moves, wall) in results.items():
+        record('drag_input', f'{label}/window_moves', moves)
+        record('drag_input', f'{label}/cpu_ms', cpu * 1000)
+        print(f'drag_input: {label:11} {rate_hz} Hz for {wall:.2f} s, {moves} window moves, '
+              f'{cpu * 1000:.0f} ms CPU ({cpu / wall * 100:.0f}%)')
+    return results['coalesced'][0] < results['every_event'][0]
+
+
+def startup(app, runs=5):
+    # Cold starts in fresh interpreters; test5 reports its own import and
+    # first-paint times and exits non-zero past QUICKBALL_STARTUP_BUDGET_MS.
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test5.py')
+    env = dict(os.environ, QUICKBALL_STARTUP_REPORT='1', QT_QPA_PLATFORM='offscreen',
+               QUICKBALL_SOCKET=os.path.abspath('startup.sock'))
+    ok = True
+    first_paint = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, script], env=env, capture_output=True, text=True, timeout=60)
+        wall = (time.perf_counter() - start) * 1000
+        report = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"startup: import {report['import_ms']} ms, first paint {report['first_paint_ms']} ms, "
+              f"process wall {wall:.0f} ms (budget {report['budget_ms']} ms)")
+        ok = ok and proc.returncode == 0
+        first_paint.append(report['first_paint_ms'])
+    record('startup', 'first_paint_ms', min(first_paint))
+    return ok
+
+
+def hot_paths(app, sizes=(100, 1000, 10000, 50000), repeat=3, legacy_limit=1000):
+    from PyQt5.QtCore import QModelIndex
+    import shortcut_store
+    from shortcut_store import ShortcutStore
+    import test3
+    import test4
+    import test5
+
+    def settle():
+        app.processEvents()
+        app.sendPostedEvents(None, QEvent.DeferredDelete)
+
+    for count in sizes:
+        path = f'hot-{count}.json'
+        with open(path, 'w') as f:
+            json.dump(make_shortcuts(count), f)
+        middle = count // 2
+
+        # test5: one long-lived panel over a model.
+        store = ShortcutStore(path)
+        store.get()
+        ball = test5.QuickBall()
+        ball.store = store
+        ball.show()
+        settle()
+
+        def toggle():
+            ball.toggle_panel()
+            app.processEvents()
+
+        # Each timed toggle reopens the panel that its setup toggle closed.
+        timings = {'open_cold_ms': timed(toggle)}
+        timings['open_ms'] = best_of(toggle, repeat, setup=toggle)
+        panel = ball.panel
+
+        def populate():
+            panel.populate_list()
+            app.processEvents()
+
+        def save():
+            store.save()
+            store.flush()
+
+        def save_reordered():
+            panel.model.moveRows(QModelIndex(), 0, 1, QModelIndex(), count)
+            store.flush()
+
+        def edit():
+            panel.model.update(middle, dict(store.shortcuts[middle], name='Edited'))
+            panel.filter_list(panel.search_input.text())
+            store.flush()
+
+        def delete():
+            panel.delete_shortcut(panel.model.index(middle))
+            store.flush()
+
+        for name, func in (('populate_list', populate), ('save', save), ('save_reordered', save_reordered),
+                           ('edit', edit), ('delete', delete)):
+            timings[f'{name}_ms'] = best_of(func, repeat)
+        for name, ms in timings.items():
+            record('hot_paths', f'test5/{count}/{name}', ms)
+        ball.close()
+        ball.shutdown()
+        ball.deleteLater()
+        settle()
+
+        # test3 and test4 rebuild a widget row per shortcut on every change.
+        # Past legacy_limit they take minutes per operation (test4 at 10k
+        # rows), and test3, which has no scroll area, outgrows any backing
+        # store and crashes.
+        if count > legacy_limit:
+            print(f'hot_paths: test3/test4 skipped at {count} shortcuts (legacy_limit {legacy_limit})')
+            continue
+        for module, rebuild in ((test3, 'refresh_ui'), (test4, 'draw_items')):
+            store = ShortcutStore(path)
+            store.get()
+            # The older balls look their store up through get_store().
+            shortcut_store._store = store
+            ball = module.QuickBall()
+            ball.show()
+            settle()
+            open_panel = ball.show_shortcuts if module is test3 else ball.toggle_panel
+
+            timings = {'open_ms': timed(lambda: (open_panel(), app.processEvents()))}
+            panel = ball.panel
+            timings[f'{rebuild}_ms'] = timed(lambda: (getattr(panel, rebuild)(), app.processEvents()))
+            settle()
+            if module is test3:
+                timings['save_ms'] = timed(lambda: (panel.save_and_refresh(), store.flush()))
+                settle()
+                timings['save_reordered_ms'] = timed(lambda: (panel.move_down(0), store.flush()))
+            else:
+                timings['save_ms'] = timed(lambda: (panel.save(), store.flush()))
+                settle()
+                shortcuts = panel.shortcuts
+                shortcuts[0], shortcuts[1] = shortcuts[1], shortcuts[0]
+                timings['save_reordered_ms'] = timed(lambda: (panel.save(), store.flush()))
+            settle()
+            timings['delete_ms'] = timed(lambda: (panel.delete_shortcut(middle), store.flush(),
+                                                  app.processEvents()))
+            for name, ms in timings.items():
+                record('hot_paths', f'{module.__name__}/{count}/{name}', ms)
+            panel.close()
+            panel.deleteLater()
+            ball.close()
+            ball.deleteLater()
+            settle()
+        shortcut_store._store = None
+
+    for metric, ms in RESULTS['hot_paths'].items():
+        print(f'hot_paths: {metric:40} {ms:10.2f} ms')
+    return True
+
+
+def bulk_import(app, count=100000, duplicate_every=10, max_stall_ms=50):
+    from PyQt5.QtCore import QEventLoop, QSize
+    from PyQt5.QtGui import QIcon
+    from shortcut_store import ShortcutStore
+    from shortcut_model import ShortcutModel
+    from icon_cache import IconCache
+    from importer import Importer
+
+    # A Netscape bookmark export where every tenth link repeats an earlier one.
+    with open('bookmarks.html', 'w') as f:
+        f.write('<!DOCTYPE NETSCAPE-Bookmark-file-1>\n<DL><p>\n')
+        for i in range(count):
+            n = i - 1 if i % duplicate_every == duplicate_every - 1 else i
+            f.write(f'    <DT><A HREF="https://example.com/page/{n}" ADD_DATE="0">Page {n}</A>\n')
+        f.write('</DL><p>\n')
+    with open('import.json', 'w') as f:
+        json.dump([], f)
+
+    store = ShortcutStore('import.json')
+    store.get()
+    model = ShortcutModel(store, IconCache(QSize(24, 24), QIcon()))
+    writes = []
+    store.backend.saved.connect(writes.append)
+    importer = Importer('icons/default.png')
+    stalls = []
+    loop = QEventLoop()
+    result = {}
+
+    def on_batch(batch):
+        start = time.perf_counter()
+        model.extend(batch)
+        stalls.append((time.perf_counter() - start) * 1000)
+
+    def on_finished(duplicates):
+        store.end_bulk()
+        result['duplicates'] = duplicates
+        loop.quit()
+
+    importer.batch_ready.connect(on_batch)
+    importer.finished.connect(on_finished)
+    start = time.perf_counter()
+    store.begin_bulk()
+    importer.start('bookmarks.html', store.shortcuts)
+    loop.exec_()
+    total = (time.perf_counter() - start) * 1000
+    store.flush()
+    app.processEvents()
+
+    rows = len(store.shortcuts)
+    record('bulk_import', 'total_ms', total)
+    record('bulk_import', 'max_batch_ms', max(stalls))
+    record('bulk_import', 'writes', len(writes))
+    print(f"bulk_import: {count} bookmarks -> {rows} shortcuts, {result['duplicates']} duplicates, "
+          f"{total:.0f} ms, {len(stalls)} batches, longest GUI batch {max(stalls):.1f} ms, {len(writes)} writes")
+    return rows + result['duplicates'] == count and len(writes) == 1 and max(stalls) <= max_stall_ms
+
+
+def app_index(app, count=2000):
+    from PyQt5.QtCore import QEventLoop
+    from app_index import AppIndex
+
+    apps = os.path.abspath('applications')
+    os.makedirs(apps, exist_ok=True)
+    for i in range(count):
+        with open(os.path.join(apps, f'app{i}.desktop'), 'w') as f:
+            f.write(f'[Desktop Entry]\nType=Application\nName=Application {i}\nExec=app{i}\nIcon=app{i}\n')
+
+    def scan():
+        index = AppIndex([apps], os.path.abspath('applications.json'))
+        loop = QEventLoop()
+        index.ready.connect(loop.quit)
+        start = time.perf_counter()
+        index.load()
+        loop.exec_()
+        return index, (time.perf_counter() - start) * 1000
+
+    cold, cold_ms = scan()
+    warm, warm_ms = scan()
+    start = time.perf_counter()
+    hits = warm.search('cation 19')
+    search_ms = (time.perf_counter() - start) * 1000
+
+    record('app_index', 'cold_scan_ms', cold_ms)
+    record('app_index', 'warm_scan_ms', warm_ms)
+    record('app_index', 'search_ms', search_ms)
+    print(f'app_index: {count} desktop files, cold scan {cold_ms:.1f} ms ({cold.parsed} parsed), '
+          f'cached scan {warm_ms:.1f} ms ({warm.parsed} parsed), search {search_ms:.2f} ms, {len(hits)} hits')
+    return len(warm.apps) == count and warm.parsed == 0 and len(hits) > 0
+
+
+def command_latency(app, requests=50, shortcuts=1000):
+    import threading
+    import statistics
+    import test5
+    from daemon import Daemon
+    from instance import request
+
+    with open(test5.SHORTCUTS_FILE, 'w') as f:
+        json.dump(make_shortcuts(shortcuts) + [{'name': 'True', 'path': '/bin/true'}], f)
+    ball = test5.QuickBall()
+    daemon = Daemon(ball, os.path.abspath('bench.sock'))
+    if not daemon.acquire() or not daemon.serve():
+        print('command_latency: could not listen')
+        return False
+
+    # The client runs on a thread, as the CLI would in its own process, while
+    # this thread runs the ball's event loop.
+    timings = {}
+    replies = []
+
+    def client():
+        for command in (['list'], ['launch', 'True']):
+            samples = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                replies.append(request(command, daemon.path))
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[command[0]] = statistics.median(samples)
+
+    thread = threading.Thread(target=client)
+    thread.start()
+    while thread.is_alive():
+        app.processEvents()
+    daemon.close()
+    ball.close()
+
+    ok = all(r and r['ok'] for r in replies)
+    for name, ms in timings.items():
+        record('command_latency', f'{name}_ms', ms)
+    print(f"command_latency: median round trip over {requests} requests, list ({shortcuts} shortcuts) "
+          f"{timings['list']:.2f} ms, launch {timings['launch']:.2f} ms")
+    return ok
+
+
+def folders(app, folders=100, per_folder=1000):
+    # Collapsed folders should cost one row each, and a move between two
+    # folders should touch only the moved row on SQLite.
+    from storage import JsonBackend, SqliteBackend
+    from shortcut_store import ShortcutStore
+    from shortcut_model import ShortcutModel
+    from icon_cache import IconCache
+    from PyQt5.QtCore import QSize
+    from PyQt5.QtGui import QIcon
+
+    tree = [{'name': f'Folder {i}', 'children': make_shortcuts(per_folder)} for i in range(folders)]
+    flat = make_shortcuts(folders * per_folder)
+    ok = True
+    for backend_class, ext in ((JsonBackend, 'json'), (SqliteBackend, 'db')):
+        for layout, shortcuts in (('flat', flat), ('folders', tree)):
+            path = f'folders-{layout}.{ext}'
+            if os.path.exists(path):
+                os.remove(path)
+            backend = backend_class(path)
+            backend.save_all(shortcuts)
+            backend.close()
+
+            store = ShortcutStore(path)
+            load_ms = timed(store.get)
+            model = ShortcutModel(store, IconCache(QSize(24, 24), QIcon()))
+            results = {'load': load_ms, 'rows': model.rowCount()}
+            if layout == 'folders':
+                results['open'] = timed(lambda: store.children(None, 0))
+                store.children(None, 1)
+                source, dest = store.shortcuts[0]['children'], store.shortcuts[1]['children']
+                before = store.backend.db.total_changes if ext == 'db' else 0
+                results['move'] = timed(lambda: (store.move_to(source, 0, 1, dest, 0), store.flush()))
+                if ext == 'db':
+                    results['rows_written'] = store.backend.db.total_changes - before
+                    ok = ok and results['rows_written'] == 1
+                ok = ok and results['rows'] == folders
+            store.backend.close()
+            for name, value in results.items():
+                record('folders', f'{backend_class.__name__}/{layout}/{name}' + ('' if name.startswith('rows') else '_ms'),
+                       value)
+            row = ' '.join(f'{name} {value:8.2f}' for name, value in results.items())
+            print(f'folders: {backend_class.__name__:13} {layout:8} {row}')
+    return ok
+
+
+def record_memory(app, count=100000):
+    # Footprint of the loaded list: plain dicts as json.load returns them
+    # against the Shortcut records the store keeps.
+    import gc
+    import tracemalloc
+    from shortcut import records
+
+    text = json.dumps(make_shortcuts(count))
+    results = {}
+    for name, load in (('dicts', json.loads), ('records', lambda t: records(json.loads(t)))):
+        gc.collect()
+        tracemalloc.start()
+        shortcuts = load(text)
+        gc.collect()
+        results[name] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del shortcuts
+    for name, size in results.items():
+        record('record_memory', f'{name}/{count}/bytes_per_shortcut', size / count)
+    print(f"record_memory: {count} shortcuts, dicts {results['dicts'] / count:.0f} B each, "
+          f"records {results['records'] / count:.0f} B each")
+    return results['records'] < results['dicts']
+
+
+def progressive_load(app, sizes=(10000, 100000, 500000), max_first_row_ms=100):
+    # Time to the first row in the panel's model should not grow with the
+    # file; the rest streams in while the GUI keeps running.
+    from shortcut_store import ShortcutStore
+    from shortcut_model import ShortcutModel
+    from icon_cache import IconCache
+    from PyQt5.QtCore import QSize, QEventLoop
+    from PyQt5.QtGui import QIcon
+
+    ok = True
+    for count in sizes:
+        path = f'progressive-{count}.json'
+        with open(path, 'w') as f:
+            json.dump(make_shortcuts(count), f)
+        store = ShortcutStore(path)
+        model = ShortcutModel(store, IconCache(QSize(24, 24), QIcon()))
+        longest = [0.0]
+
+        def on_loading(row, n):
+            longest.append(time.perf_counter())
+
+        def on_loaded(row, n):
+            longest[0] = max(longest[0], (time.perf_counter() - longest.pop()) * 1000)
+
+        store.rows_loading.connect(on_loading)
+        store.rows_loaded.connect(on_loaded)
+        start = time.perf_counter()
+        store.load()
+        while not model.rowCount():
+            app.processEvents()
+        first_row_ms = (time.perf_counter() - start) * 1000
+        while store.loading:
+            app.processEvents(QEventLoop.WaitForMoreEvents)
+        total_ms = (time.perf_counter() - start) * 1000
+        # The search index builds on a worker once the load ends; on one core
+        # it would slow whatever is timed next.
+        store.finish_indexing()
+        sync_ms = timed(lambda: ShortcutStore(path).get())
+        ok = ok and first_row_ms <= max_first_row_ms and model.rowCount() == count
+        record('progressive_load', f'{count}/first_row_ms', first_row_ms)
+        record('progressive_load', f'{count}/total_ms', total_ms)
+        record('progressive_load', f'{count}/longest_batch_ms', longest[0])
+        record('progressive_load', f'{count}/blocking_load_ms', sync_ms)
+        print(f'progressive_load: {count:6} shortcuts, first row {first_row_ms:6.1f} ms, all {total_ms:7.1f} ms, '
+              f'longest GUI batch {longest[0]:5.1f} ms (blocking load {sync_ms:7.1f} ms)')
+        store.loader.wait()
+    return ok
+
+
+def icon_store(app, images=20, picks=200, source_size=512, icon_px=32):
+    # Picking the same images over and over should store each once, and the
+    # panel should decode a small variant instead of the original.
+    from PyQt5.QtCore import QSize
+    from PyQt5.QtGui import QImage, QImageReader, QColor
+    from icon_store import add_icon, collect, variant_for
+
+    os.makedirs('originals', exist_ok=True)
+    sources = []
+    for i in range(picks):
+        # Same picture under many names, and many pictures under one name.
+        path = os.path.join('originals', f'{i}', 'logo.png')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        image = QImage(source_size, source_size, QImage.Format_ARGB32)
+        image.fill(QColor.fromHsv(i % images * 360 // images, 200, 200))
+        image.save(path)
+        sources.append(path)
+    start = time.perf_counter()
+    stored = [add_icon(path, 'store') for path in sources]
+    add_ms = (time.perf_counter() - start) * 1000
+    files = len(os.listdir('store'))
+
+    def decode(path):
+        reader = QImageReader(path)
+        source = reader.size()
+        if source.width() > icon_px or source.height() > icon_px:
+            reader.setScaledSize(source.scaled(QSize(icon_px, icon_px), 1))
+        return reader.read()
+
+    original_ms = best_of(lambda: [decode(p) for p in sources[:images]], 3) / images
+    variant_ms = best_of(lambda: [decode(variant_for(p, icon_px)) for p in stored[:images]], 3) / images
+    removed = collect(stored[:images // 2], 'store')
+    record('icon_store', 'add_ms', add_ms / picks)
+    record('icon_store', 'files', files)
+    record('icon_store', 'decode_original_ms', original_ms)
+    record('icon_store', 'decode_variant_ms', variant_ms)
+    record('icon_store', 'collected', removed)
+    print(f'icon_store: {picks} picks of {images} images -> {files} files, add {add_ms / picks:.2f} ms each, '
+          f'decode {original_ms:.2f} ms original vs {variant_ms:.2f} ms variant, gc removed {removed}')
+    return files == images * 3 and removed == (images - images // 2) * 3
+
+
+def health_check(app, count=10000, dirs=128, missing_every=10, max_total_ms=5000, max_batch_ms=20):
+    # Every target is stat'ed off the GUI thread; afterwards only what a
+    # watched directory reports as changed is looked at again.
+    from PyQt5.QtCore import QEventLoop
+    from health import HealthChecker
+
+    class TimedChecker(HealthChecker):
+        def on_checked(self, seq, results):
+            start = time.perf_counter()
+            super().on_checked(seq, results)
+            batches.append((time.perf_counter() - start) * 1000)
+
+    paths = []
+    for i in range(count):
+        path = os.path.abspath(os.path.join('targets', f'd{i % dirs}', f'target{i}'))
+        if i % missing_every:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'w').close()
+        paths.append(path)
+    batches = []
+    checker = TimedChecker()
+
+    def settle():
+        while (checker.requested or checker.queued or checker.timer.isActive()
+               or checker.notify_timer.isActive()):
+            app.processEvents(QEventLoop.WaitForMoreEvents)
+
+    start = time.perf_counter()
+    checker.check(paths)
+    settle()
+    total_ms = (time.perf_counter() - start) * 1000
+    broken = sum(checker.is_broken(p) for p in paths)
+    cached_ms = timed(lambda: checker.check(paths))
+    serial_ms = timed(lambda: [os.path.exists(p) for p in paths])
+
+    # One target goes away, a missing one appears.
+    changed = []
+    checker.changed.connect(changed.extend)
+    start = time.perf_counter()
+    os.remove(paths[1])
+    open(paths[0], 'w').close()
+    while len(changed) < 2 and time.perf_counter() - start < 5:
+        app.processEvents(QEventLoop.WaitForMoreEvents, 100)
+    notice_ms = (time.perf_counter() - start) * 1000
+    settle()
+    start = time.perf_counter()
+    checker.check(paths, force=True)
+    settle()
+    forced_ms = (time.perf_counter() - start) * 1000
+    # Gated on the 90th percentile: the four stat threads want the GIL too,
+    # and on a busy machine any single batch can wait for it.
+    batches.sort()
+    p90_ms = batches[len(batches) * 9 // 10]
+
+    record('health_check', 'total_ms', total_ms)
+    record('health_check', 'p90_batch_ms', p90_ms)
+    record('health_check', 'max_batch_ms', batches[-1])
+    record('health_check', 'cached_ms', cached_ms)
+    record('health_check', 'notice_ms', notice_ms)
+    record('health_check', 'revalidate_ms', forced_ms)
+    print(f'health_check: {count} targets in {dirs} directories, {broken} broken, checked in {total_ms:.0f} ms '
+          f'(serial stat {serial_ms:.0f} ms on the GUI thread), GUI batches 90th percentile {p90_ms:.1f} ms '
+          f'longest {batches[-1]:.1f} ms, '
+          f'cached check {cached_ms:.1f} ms, change noticed in {notice_ms:.0f} ms, '
+          f'forced revalidation {forced_ms:.0f} ms, {len(checker.watched)} watches')
+    return (broken == count // missing_every and total_ms <= max_total_ms and p90_ms <= max_batch_ms
+            and sorted(changed) == sorted(paths[:2]) and checker.is_broken(paths[1])
+            and not checker.is_broken(paths[0]))
+
+
+def launch_group(app, members=32, missing_every=8):
+    # A group spawns its members on the launcher's pool: never more than
+    # LAUNCH_THREADS at once, and every member reports back.
+    import threading
+    from PyQt5.QtCore import QEventLoop
+    import launcher
+    from launcher import Launcher, LAUNCH_THREADS
+
+    paths = []
+    for i in range(members):
+        path = os.path.abspath(f'member{i}.sh')
+        if i % missing_every != missing_every - 1:
+            with open(path, 'w') as f:
+                f.write('#!/bin/sh\nexit 0\n')
+            os.chmod(path, 0o755)
+        paths.append(path)
+
+    lock = threading.Lock()
+    running = [0, 0]
+    spawn = launcher.spawn
+
+    def counted(path):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        try:
+            return spawn(path)
+        finally:
+            with lock:
+                running[0] -= 1
+
+    def run(threads):
+        group_launcher = Launcher()
+        group_launcher.pool.setMaxThreadCount(threads)
+        loop = QEventLoop()
+        done = []
+        group_launcher.group_finished.connect(lambda group, results: (done.extend(results), loop.quit()))
+        start = time.perf_counter()
+        group_launcher.launch_group(paths)
+        loop.exec_()
+        return (time.perf_counter() - start) * 1000, done
+
+    launcher.spawn = counted
+    try:
+        serial_ms, _ = run(1)
+        running[1] = 0
+        total_ms, results = run(LAUNCH_THREADS)
+    finally:
+        launcher.spawn = spawn
+    spawn_ms = sorted(ms for path, ok, error, ms in results)
+    failed = [path for path, ok, error, ms in results if not ok]
+    record('launch_group', 'total_ms', total_ms)
+    record('launch_group', 'median_spawn_ms', spawn_ms[len(spawn_ms) // 2])
+    record('launch_group', 'max_spawn_ms', spawn_ms[-1])
+    print(f'launch_group: {members} members, all reported in {total_ms:.1f} ms (one at a time {serial_ms:.1f} ms), '
+          f'spawn median {spawn_ms[len(spawn_ms) // 2]:.2f} ms max {spawn_ms[-1]:.2f} ms, '
+          f'{len(failed)} failed, at most {running[1]} at once')
+    return ([path for path, ok, error, ms in results] == paths and running[1] <= LAUNCH_THREADS
+            and failed == paths[missing_every - 1::missing_every])
+
+
+def compare(results, baseline, tolerance=TOLERANCE, floor=NOISE_FLOOR):
+    regressions = []
+    for benchmark, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(benchmark, {}).get(metric)
+            if old is None:
+                continue
+            if value > old * (1 + tolerance) and value - old > floor:
+                regressions.append((f'{benchmark}/{metric}', old, value))
+    return regressions
+
+
+def fuzzy_search(app, count=100000, max_keystroke_ms=16.0):
+    from PyQt5.QtCore import QEventLoop
+    from shortcut_store import ShortcutStore
+
+    # Filler names share words, as real lists do; a few real apps to find.
+    words = ['report', 'notes', 'project', 'server', 'client', 'backup', 'music', 'photo', 'editor', 'viewer']
+    apps = ['Google Chrome', 'GNU Image Manipulation Program', 'Thunderbird', 'Visual Studio Code']
+    shortcuts = [{'name': name, 'path': '/usr/bin/' + name.split()[-1].lower()} for name in apps]
+    shortcuts += [{'name': f'{words[i % 10]} {words[i // 10 % 10]} {words[i // 100 % 10]} {i}',
+                   'path': f'/home/user/{words[i % 7]}/{i}.txt'} for i in range(count)]
+    with open('search.json', 'w') as f:
+        json.dump(shortcuts, f)
+
+    store = ShortcutStore('search.json')
+    start = time.perf_counter()
+    store.load()
+    while store.loading or store.indexing is not None:
+        app.processEvents(QEventLoop.WaitForMoreEvents, 50)
+    ready_ms = (time.perf_counter() - start) * 1000
+
+    # Typed a letter at a time, then typos and abbreviations.
+    queries = [query[:n] for query in ('thunderbird', 'project notes') for n in range(1, len(query) + 1)]
+    queries += ['chrme', 'thndrbird', 'gimp', 'vsc', 'reprot']
+    samples = []
+    hits = {}
+    for query in queries:
+        start = time.perf_counter()
+        hits[query] = store.search(query, 50)
+        samples.append((time.perf_counter() - start) * 1000)
+    # Gated on the 90th percentile: a collection or a busy core can stretch
+    # any single keystroke.
+    samples.sort()
+    median_ms = samples[len(samples) // 2]
+    p90_ms = samples[len(samples) * 9 // 10]
+    found = all(hits[query] and hits[query][0]['name'] == name for query, name in
+                (('chrme', 'Google Chrome'), ('thndrbird', 'Thunderbird'),
+                 ('gimp', 'GNU Image Manipulation Program'), ('vsc', 'Visual Studio Code')))
+
+    record('fuzzy_search', 'ready_ms', ready_ms)
+    record('fuzzy_search', 'keystroke_median_ms', median_ms)
+    record('fuzzy_search', 'keystroke_p90_ms', p90_ms)
+    record('fuzzy_search', 'keystroke_max_ms', samples[-1])
+    print(f'fuzzy_search: {count} shortcuts loaded and indexed in {ready_ms:.0f} ms, {len(queries)} keystrokes '
+          f'median {median_ms:.2f} ms, 90th percentile {p90_ms:.2f} ms, max {samples[-1]:.2f} ms, '
+          f"typos and abbreviations {'found' if found else 'MISSED'}")
+    return found and p90_ms <= max_keystroke_ms
+
+
+BENCHMARKS = {
+    'soak_panel': soak_panel,
+    'panel_scaling': panel_scaling,
+    'storage_backends': storage_backends,
+    'startup': startup,
+    'idle_wakeups': idle_wakeups,
+    'drag_paint': drag_paint,
+    'drag_input': drag_input,
+    'hot_paths': hot_paths,
+    'bulk_import': bulk_import,
+    'app_index': app_index,
+    'command_latency': command_latency,
+    'folders': folders,
+    'record_memory': record_memory,
+    'progressive_load': progressive_load,
+    'icon_store': icon_store,
+    'health_check': health_check,
+    'launch_group': launch_group,
+    'fuzzy_search': fuzzy_search,
+}
+
+
+def run_isolated(name):
+    # Each benchmark leaves balls, panels, stores and worker pools behind;
+    # run in its own process it cannot skew the ones after it.
+    fd, output = tempfile.mkstemp(prefix=f'quickball-bench-{name}-', suffix='.json')
+    os.close(fd)
+    try:
+        status = subprocess.run([sys.executable, os.path.abspath(__file__), name, '--json', output]).returncode
+        try:
+            with open(output) as f:
+                RESULTS.update(json.load(f)['results'])
+        except (OSError, ValueError, KeyError):
+            print(f'{name}: no results', file=sys.stderr)
+            return False
+    finally:
+        os.remove(output)
+    if status != 0:
+        print(f'{name}: failed', file=sys.stderr)
+    return status == 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='bench.py', description='Headless Quick Ball benchmarks.')
+    parser.add_argument('names', nargs='*', metavar='benchmark',
+                        help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--json', metavar='FILE', help='write the results to FILE')
+    parser.add_argument('--baseline', metavar='FILE', help='flag metrics that regressed against FILE')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help=f'allowed slowdown as a fraction of the baseline (default {TOLERANCE})')
+    parser.add_argument('--in-process', action='store_true',
+                        help='run several benchmarks in this process instead of one process each')
+    args = parser.parse_args(argv[1:])
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+    output = os.path.abspath(args.json) if args.json else None
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    names = args.names or list(BENCHMARKS)
+    ok = True
+    if len(names) > 1 and not args.in_process:
+        for name in names:
+            ok = run_isolated(name) and ok
+    else:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        os.chdir(tempfile.mkdtemp(prefix='quickball-bench-'))
+        app = QApplication(sys.argv)
+        for name in names:
+            ok = BENCHMARKS[name](app) and ok
+
+    if output:
+        report = {'python': platform.python_version(), 'qt': QT_VERSION_STR, 'results': RESULTS}
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if baseline is not None:
+        regressions = compare(RESULTS, baseline, args.tolerance)
+        for metric, old, new in regressions:
+            print(f'REGRESSION {metric}: {old} -> {new}')
+        print(f'{len(regressions)} regressions against {args.baseline}')
+        ok = ok and not regressions
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
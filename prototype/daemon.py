@@ -0,0 +1,188 @@
+from PyQt5.QtCore import QObject, QLockFile
+from instance import encode, socket_path
+
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+class Daemon(QObject):
+    # Serves the commands of instance.request() for a running ball. Each
+    # connection carries one request line and gets one reply line.
+    def __init__(self, ball, path=None, parent=None):
+        super().__init__(parent)
+        self.ball = ball
+        self.path = path or socket_path()
+        self.lock = QLockFile(self.path + '.lock')
+        self.server = None
+        self.buffers = {}
+        self.launcher = None
+        self.launches = {}
+        self.group_launches = {}
+
+    def acquire(self):
+        # The lock file decides who serves: a socket left behind by a crashed
+        # instance is only removed once we hold it.
+        return self.lock.tryLock(0)
+
+    def serve(self):
+        # Separate from acquire() so the ball can paint before QtNetwork loads;
+        # clients arriving earlier retry until the socket is there.
+        from PyQt5.QtNetwork import QLocalServer
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.on_connection)
+        QLocalServer.removeServer(self.path)
+        return self.server.listen(self.path)
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.lock.unlock()
+
+    def on_connection(self):
+        while self.server.hasPendingConnections():
+            sock = self.server.nextPendingConnection()
+            self.buffers[sock] = b''
+            sock.readyRead.connect(lambda sock=sock: self.on_ready_read(sock))
+            sock.disconnected.connect(lambda sock=sock: self.drop(sock))
+
+    def drop(self, sock):
+        self.buffers.pop(sock, None)
+        for waiting in self.launches.values():
+            if sock in waiting:
+                waiting.remove(sock)
+        for group, waiting in list(self.group_launches.items()):
+            if waiting is sock:
+                del self.group_launches[group]
+        sock.deleteLater()
+
+    def on_ready_read(self, sock):
+        data = self.buffers.get(sock, b'') + bytes(sock.readAll())
+        if b'\n' not in data:
+            if len(data) > MAX_REQUEST_BYTES:
+                self.reply(sock, {'ok': False, 'error': 'Request too large'})
+            else:
+                self.buffers[sock] = data
+            return
+        self.buffers[sock] = b''
+        import json
+        try:
+            command = json.loads(data.split(b'\n', 1)[0])['command']
+            handler = getattr(self, 'do_' + command[0], None)
+        except (ValueError, KeyError, TypeError, IndexError):
+            self.reply(sock, {'ok': False, 'error': 'Malformed request'})
+            return
+        if handler is None:
+            self.reply(sock, {'ok': False, 'error': f'Unknown command: {command[0]}'})
+            return
+        try:
+            response = handler(sock, *command[1:])
+        except TypeError:
+            self.reply(sock, {'ok': False, 'error': f'Wrong arguments for {command[0]}'})
+            return
+        except Exception as e:
+            # An exception escaping a Qt slot aborts the ball; the caller
+            # hears about it instead.
+            self.reply(sock, {'ok': False, 'error': f'{command[0]} failed: {e}'})
+            return
+        if response is not None:
+            self.reply(sock, response)
+
+    def reply(self, sock, response):
+        self.buffers.pop(sock, None)
+        sock.write(encode(response))
+        sock.flush()
+        sock.disconnectFromServer()
+
+    def do_show(self, sock):
+        self.ball.show()
+        self.ball.raise_()
+        self.ball.wake()
+        return {'ok': True}
+
+    def do_list(self, sock):
+        store = self.ball.load_store()
+        store.get()
+        from shortcut import targets
+        return {'ok': True, 'result': [{'name': s['name'], 'members': targets(s)} if 'members' in s
+                                       else {'name': s['name'], 'path': s['path']} for s in store.leaves()]}
+
+    def do_launch(self, sock, name):
+        from frecency import get_tracker
+        from shortcut_panel import USAGE_FILE
+        if not isinstance(name, str):
+            return {'ok': False, 'error': 'The name must be a string'}
+        store = self.ball.load_store()
+        store.get()
+        found = store.find('name', name)
+        if not found:
+            hits = store.search(name, 20)
+            found = [s for s in hits if s['name'].lower() == name.lower() and 'children' not in s]
+            if not found:
+                suggestions = ', '.join(s['name'] for s in hits[:3])
+                hint = f' (did you mean: {suggestions})' if suggestions else ''
+                return {'ok': False, 'error': f'No shortcut named {name!r}{hint}'}
+        shortcut = found[0]
+        # Answered once the launcher reports back, so failures reach the caller.
+        if self.launcher is None:
+            from launcher import Launcher
+            self.launcher = Launcher(self)
+            self.launcher.finished.connect(self.on_launch_finished)
+            self.launcher.group_finished.connect(self.on_group_finished)
+        if 'members' in shortcut:
+            from shortcut import targets
+            paths = targets(shortcut)
+            for path in paths:
+                get_tracker(USAGE_FILE).record(path)
+            self.group_launches[self.launcher.launch_group(paths)] = sock
+            return None
+        get_tracker(USAGE_FILE).record(shortcut['path'])
+        self.launches.setdefault(shortcut['path'], []).append(sock)
+        self.launcher.launch(shortcut['path'])
+        return None
+
+    def on_launch_finished(self, path, ok, error):
+        waiting = self.launches.get(path)
+        if not waiting:
+            return
+        sock = waiting.pop(0)
+        if not waiting:
+            del self.launches[path]
+        self.reply(sock, {'ok': ok, 'result': path} if ok else {'ok': False, 'error': error})
+
+    def on_group_finished(self, group, results):
+        sock = self.group_launches.pop(group, None)
+        if sock is None:
+            return
+        members = [{'path': path, 'ok': ok, 'error': error, 'ms': ms} for path, ok, error, ms in results]
+        failed = sum(not ok for path, ok, error, ms in results)
+        response = {'ok': not failed, 'result': members}
+        if failed:
+            response['error'] = f'{failed} of {len(results)} failed to open'
+        self.reply(sock, response)
+
+    def do_add(self, sock, name, path, icon=None):
+        from shortcut_panel import DEFAULT_ICON
+        from icon_store import add_icon
+        if not all(isinstance(arg, str) for arg in (name, path, icon or '')):
+            return {'ok': False, 'error': 'Name, path and icon must be strings'}
+        if not name or not path:
+            return {'ok': False, 'error': 'Both name and path are required'}
+        if icon:
+            try:
+                icon = add_icon(icon)
+            except (OSError, ValueError) as e:
+                return {'ok': False, 'error': str(e)}
+        shortcut = {'name': name, 'path': path, 'icon': icon or DEFAULT_ICON}
+        store = self.ball.load_store()
+        store.get()
+        # Through the panel's model when there is one so an open list updates.
+        if self.ball.panel is not None:
+            self.ball.panel.model.append(shortcut)
+        else:
+            store.insert(len(store.shortcuts), shortcut)
+        return {'ok': True}
+
+    def do_reload(self, sock):
+        store = self.ball.load_store()
+        store.force_reload()
+        return {'ok': True, 'result': len(store.shortcuts)}
@@ -0,0 +1,117 @@
+import math
+import time
+from bisect import bisect_left
+from write_behind import atomic_write
+from shortcut import targets
+
+HALF_LIFE = 3 * 24 * 3600
+DECAY = math.log(2) / HALF_LIFE
+# Timestamps are measured from a fixed epoch so old scores never need decaying:
+# a launch at time t adds exp(DECAY * (t - EPOCH)), and every score shrinks by
+# the same factor as time passes, which leaves the ranking unchanged.
+EPOCH = 1700000000.0
+COMPACT_MIN_LINES = 1000
+NEVER = float('-inf')
+
+
+def log_add(a, b):
+    if a == NEVER:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+class FrecencyTracker:
+    def __init__(self, path):
+        self.path = path
+        self.scores = {}
+        self.lines = 0
+        self.version = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    stamp, _, target = line.rstrip('\n').partition('\t')
+                    try:
+                        self.add(target, float(stamp))
+                    except ValueError:
+                        continue
+                    self.lines += 1
+        except OSError:
+            pass
+
+    def add(self, target, when):
+        self.scores[target] = log_add(self.scores.get(target, NEVER), DECAY * (when - EPOCH))
+
+    def score(self, target):
+        return self.scores.get(target, NEVER)
+
+    def record(self, target, when=None):
+        when = time.time() if when is None else when
+        self.add(target, when)
+        self.version += 1
+        try:
+            with open(self.path, 'a') as f:
+                f.write(f"{when:.0f}\t{target}\n")
+        except OSError:
+            return
+        self.lines += 1
+        if self.lines > max(COMPACT_MIN_LINES, 4 * len(self.scores)):
+            self.compact()
+
+    def compact(self):
+        # One launch at EPOCH + score / DECAY carries exactly the same weight as
+        # the whole history for that target, so the log shrinks to one line each.
+        lines = [f"{EPOCH + s / DECAY:.3f}\t{t}\n" for t, s in self.scores.items()]
+        try:
+            atomic_write(self.path, ''.join(lines))
+        except OSError:
+            return
+        self.lines = len(lines)
+
+
+_tracker = None
+
+
+def get_tracker(path):
+    global _tracker
+    if _tracker is None:
+        _tracker = FrecencyTracker(path)
+    return _tracker
+
+
+class FrecencyRanking:
+    # Pinned shortcuts keep their manual order at the top; the rest are sorted
+    # by score, ties falling back to manual order.
+    def __init__(self, tracker, shortcuts):
+        self.tracker = tracker
+        self.pinned = [s for s in shortcuts if s.get('pinned')]
+        rest = [s for s in shortcuts if not s.get('pinned')]
+        keys = [(-self.score(s), i) for i, s in enumerate(rest)]
+        order = sorted(range(len(rest)), key=keys.__getitem__)
+        self.keys = [keys[i] for i in order]
+        self.items = [rest[i] for i in order]
+        self.key_of = {id(s): keys[i] for i, s in enumerate(rest)}
+
+    def score(self, shortcut):
+        # A launch group ranks with its most used member.
+        return max((self.tracker.score(t) for t in targets(shortcut)), default=NEVER)
+
+    def shortcuts(self):
+        return self.pinned + self.items
+
+    def bump(self, shortcut):
+        # Reposition one launched shortcut instead of re-sorting everything.
+        old = self.key_of.get(id(shortcut))
+        if old is None:
+            return
+        pos = bisect_left(self.keys, old)
+        del self.keys[pos]
+        del self.items[pos]
+        new = (-self.score(shortcut), old[1])
+        pos = bisect_left(self.keys, new)
+        self.keys.insert(pos, new)
+        self.items.insert(pos, shortcut)
+        self.key_of[id(shortcut)] = new
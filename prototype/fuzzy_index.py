@@ -0,0 +1,202 @@
+import os
+import re
+import heapq
+from collections import Counter
+from itertools import chain, islice
+
+GRAM = 3
+# Past this many candidates only a bounded subset is scored; the user is
+# still typing and the next keystroke narrows it anyway.
+SCORE_LIMIT = 2000
+FUZZY_POSTING_LIMIT = 20000
+# Typo candidates: those sharing the most trigrams with the query, plus
+# names starting like it (checked for its letters in order).
+FUZZY_CANDIDATES = 100
+SPREAD_CANDIDATES = 500
+# Intersecting several postings this large costs more than probing them.
+LARGE_POSTING = 4000
+EMPTY = frozenset()
+WORD = re.compile(r'[^\W_]+')
+
+
+def grams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def initials(name):
+    # 'gimp' for "GNU Image Manipulation Program"; only names of several words.
+    words = WORD.findall(name)
+    return ''.join(w[0] for w in words) if len(words) > 1 else ''
+
+
+def spread(query, text):
+    # How much of text the query's letters span in order, or None if they
+    # are not all there: 'chrme' in "chrome" spans 6.
+    start = pos = text.find(query[0])
+    if pos < 0:
+        return None
+    for c in query[1:]:
+        pos = text.find(c, pos + 1)
+        if pos < 0:
+            return None
+    return pos - start + 1
+
+
+def typos(query, text, limit):
+    # Fewest edits turning the query into some part of text, or limit + 1
+    # as soon as that is out of reach.
+    previous = [0] * (len(text) + 1)
+    for i, q in enumerate(query, 1):
+        current = [i]
+        for j, t in enumerate(text, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (q != t)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous)
+
+
+def searchable_path(path):
+    # Directory prefixes like /usr/share/applications/ are shared by nearly
+    # every entry and would only bloat the postings; keep the part people type.
+    if '://' in path:
+        path = path.split('://', 1)[1]
+        return path[4:] if path.startswith('www.') else path
+    return os.path.basename(path.rstrip('/'))
+
+
+class FuzzyIndex:
+    def __init__(self, shortcuts=()):
+        # Keys are object ids, so the app index's plain dicts work as well as
+        # records. An edit stores a new record under the old shortcut id,
+        # which the store reports as update(old, new).
+        self.entries = {}
+        self.postings = {}
+        self.prefixes = {}
+        for s in shortcuts:
+            self.add(s)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, shortcut):
+        key = id(shortcut)
+        name = shortcut['name'].lower()
+        path = shortcut.get('path', '').lower()
+        short = initials(name)
+        self.entries[key] = (shortcut, name, path, short)
+        postings = self.postings
+        for g in grams(name) | grams(searchable_path(path)) | grams(short):
+            keys = postings.get(g)
+            if keys is None:
+                postings[g] = {key}
+            else:
+                keys.add(key)
+        for prefix in {name[:1], name[:2]}:
+            keys = self.prefixes.get(prefix)
+            if keys is None:
+                self.prefixes[prefix] = {key}
+            else:
+                keys.add(key)
+
+    def remove(self, shortcut):
+        key = id(shortcut)
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        _, name, path, short = entry
+        for g in grams(name) | grams(searchable_path(path)) | grams(short):
+            self.discard(self.postings, g, key)
+        for prefix in {name[:1], name[:2]}:
+            self.discard(self.prefixes, prefix, key)
+
+    def update(self, old, new):
+        self.remove(old)
+        self.add(new)
+
+    @staticmethod
+    def discard(table, gram, key):
+        keys = table.get(gram)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del table[gram]
+
+    def candidates(self, query):
+        # The keys to score, and for a likely typo those close enough in
+        # trigrams to be worth counting edits for (else None).
+        if len(query) < GRAM:
+            return self.prefixes.get(query, EMPTY), None
+        postings = sorted((self.postings.get(g, EMPTY) for g in grams(query)), key=len)
+        if len(postings[0]) > LARGE_POSTING:
+            return self.probe(query, postings), None
+        exact = postings[0].intersection(*postings[1:]) if postings[0] else set()
+        if exact:
+            return exact, None
+        # Nothing contains every trigram: likely a typo or an abbreviation.
+        # score() decides which of these match at all.
+        counts = Counter()
+        for keys in postings:
+            if len(keys) <= FUZZY_POSTING_LIMIT:
+                counts.update(keys)
+        close = {k for k, n in counts.most_common(FUZZY_CANDIDATES)}
+        starting = chain(self.prefixes.get(query[:2], EMPTY), self.prefixes.get(query[:1], EMPTY))
+        found = close.union(islice(starting, SPREAD_CANDIDATES))
+        return found, close
+
+    def probe(self, query, postings):
+        # Every trigram is common: walk likely hits (name prefix first) and stop
+        # once there are enough to rank instead of intersecting whole postings.
+        found = set()
+        prefixed = self.prefixes.get(query[:2], EMPTY)
+        if len(prefixed) > len(postings[0]):
+            prefixed = EMPTY
+        for key in chain(prefixed, postings[0]):
+            if key not in found and all(key in keys for keys in postings):
+                found.add(key)
+                if len(found) >= SCORE_LIMIT:
+                    break
+        return found
+
+    def score(self, key, query, query_grams, close):
+        # None when a typo candidate turns out not to match.
+        _, name, path, short = self.entries[key]
+        if name.startswith(query):
+            return (0, len(name))
+        pos = name.find(query)
+        if pos >= 0:
+            return (1, pos, len(name))
+        if short.startswith(query):
+            return (2, len(name))
+        if query in path:
+            return (3, len(path))
+        if not query_grams:
+            return (7, len(name))
+        span = spread(query, name)
+        if span is not None:
+            return (4, span - len(query), len(name))
+        if key not in close:
+            return None
+        limit = max(1, len(query) // 4)
+        distance = typos(query, name, limit)
+        if distance <= limit:
+            return (5, distance, len(name))
+        overlap = len(query_grams & (grams(name) | grams(searchable_path(path))))
+        if overlap * 2 >= len(query_grams):
+            return (6, -overlap, len(name))
+        return None
+
+    def search(self, query, limit=50):
+        query = query.strip().lower()
+        if not query:
+            return []
+        candidates, close = self.candidates(query)
+        if len(candidates) > SCORE_LIMIT:
+            preferred = EMPTY
+            if len(query) >= GRAM:
+                preferred = candidates & self.prefixes.get(query[:2], EMPTY)
+            candidates = set(islice(chain(preferred, close or EMPTY, candidates), SCORE_LIMIT))
+        query_grams = grams(query) if close is not None else EMPTY
+        scored = ((self.score(k, query, query_grams, close), k) for k in candidates)
+        ranked = heapq.nsmallest(limit, ((s, k) for s, k in scored if s is not None), key=lambda sk: sk[0])
+        return [self.entries[k][0] for _, k in ranked]
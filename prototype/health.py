@@ -0,0 +1,199 @@
+import os
+from urllib.parse import urlparse, unquote
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QFileSystemWatcher, QTimer, pyqtSignal
+from launcher import URL_SCHEMES
+from tracing import traced
+
+CHECK_THREADS = 4
+CHECK_BATCH = 500
+# inotify watches are a per-user budget shared with every other program.
+MAX_WATCHES = 1000
+RECHECK_DELAY_MS = 200
+# Results arrive in many batches; models hear about changes once per this.
+NOTIFY_DELAY_MS = 50
+
+
+def target_file(path):
+    # The file a shortcut opens, or None when it opens something else.
+    parts = urlparse(path)
+    if parts.scheme == 'file':
+        return unquote(parts.path)
+    if parts.scheme in URL_SCHEMES:
+        return None
+    return path
+
+
+def existing_dir(path, known):
+    # The nearest directory above the target that exists: creating or
+    # removing the target, or anything on the way to it, changes that one.
+    directory = os.path.dirname(os.path.abspath(path))
+    while directory not in known:
+        if os.path.isdir(directory):
+            known.add(directory)
+            break
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    return directory
+
+
+class CheckTask(QRunnable):
+    def __init__(self, checker, seq, paths):
+        super().__init__()
+        self.checker = checker
+        self.seq = seq
+        self.paths = paths
+
+    @traced('check_targets')
+    def run(self):
+        results = []
+        known = set()
+        for path in self.paths:
+            file = target_file(path)
+            if file is None:
+                results.append((path, True, None))
+                continue
+            try:
+                os.stat(file)
+                ok = True
+            except OSError:
+                ok = False
+            except ValueError:
+                results.append((path, False, None))
+                continue
+            results.append((path, ok, existing_dir(file, known)))
+        self.checker.checked.emit(self.seq, results)
+
+
+class HealthChecker(QObject):
+    # Whether shortcut targets still exist. Results are kept until a watched
+    # directory above a target changes; targets under directories that could
+    # not be watched are checked again on revalidate().
+    checked = pyqtSignal(int, list)
+    changed = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.states = {}
+        self.requested = {}
+        self.seq = 0
+        self.queued = set()
+        self.dirty = set()
+        self.dirs = {}
+        self.dir_of = {}
+        self.watched = set()
+        self.unwatched = set()
+        self.changed_paths = set()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(CHECK_THREADS)
+        self.checked.connect(self.on_checked)
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+        self.notify_timer = QTimer(self)
+        self.notify_timer.setSingleShot(True)
+        self.notify_timer.timeout.connect(self.notify)
+
+    def is_broken(self, path):
+        # Unknown paths read as fine and are checked in the background.
+        state = self.states.get(path)
+        if state is None:
+            if path not in self.requested:
+                self.queued.add(path)
+                self.schedule(0)
+            return False
+        return not state
+
+    def check(self, paths, force=False):
+        for path in paths:
+            if path in self.requested and not force:
+                continue
+            if force or path not in self.states or path in self.unwatched:
+                self.queued.add(path)
+        if self.queued:
+            self.schedule(0)
+
+    def revalidate(self):
+        # Cheap enough for every panel open: nothing is walked, and only what
+        # no watch vouches for is queued again.
+        if self.unwatched:
+            self.queued |= self.unwatched
+            self.schedule(0)
+
+    def schedule(self, delay):
+        if not self.timer.isActive():
+            self.timer.start(delay)
+
+    def on_directory_changed(self, directory):
+        # Editors and installers touch a directory many times in a row.
+        self.dirty.add(directory)
+        self.schedule(RECHECK_DELAY_MS)
+
+    def flush(self):
+        for directory in self.dirty:
+            if not os.path.isdir(directory):
+                self.watched.discard(directory)
+                self.watcher.removePath(directory)
+            self.queued.update(self.dirs.get(directory, ()))
+        self.dirty.clear()
+        paths = list(self.queued)
+        self.queued.clear()
+        for start in range(0, len(paths), CHECK_BATCH):
+            self.seq += 1
+            batch = paths[start:start + CHECK_BATCH]
+            for path in batch:
+                self.requested[path] = self.seq
+            self.pool.start(CheckTask(self, self.seq, batch))
+
+    def on_checked(self, seq, results):
+        changed = []
+        for path, ok, directory in results:
+            # A later check of the same path is on its way.
+            if self.requested.get(path) != seq:
+                continue
+            del self.requested[path]
+            if self.states.get(path, True) != ok:
+                changed.append(path)
+            self.states[path] = ok
+            old = self.dir_of.get(path)
+            if old != directory:
+                if old is not None:
+                    self.dirs[old].discard(path)
+                self.dir_of[path] = directory
+                if directory is not None:
+                    self.dirs.setdefault(directory, set()).add(path)
+            if directory is None or self.watch(directory):
+                self.unwatched.discard(path)
+            else:
+                self.unwatched.add(path)
+        if changed:
+            self.changed_paths.update(changed)
+            if not self.notify_timer.isActive():
+                self.notify_timer.start(NOTIFY_DELAY_MS)
+
+    def notify(self):
+        paths = list(self.changed_paths)
+        self.changed_paths.clear()
+        self.changed.emit(paths)
+
+    def watch(self, directory):
+        if directory in self.watched:
+            return True
+        if len(self.watched) >= MAX_WATCHES or not self.watcher.addPath(directory):
+            return False
+        self.watched.add(directory)
+        return True
+
+
+_health_checker = None
+
+
+def get_health_checker():
+    global _health_checker
+    if _health_checker is None:
+        _health_checker = HealthChecker()
+    return _health_checker
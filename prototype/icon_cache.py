@@ -0,0 +1,133 @@
+import os
+from collections import OrderedDict
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QIcon, QImage, QImageReader, QPixmap
+from icon_store import variant_for
+from tracing import traced
+
+CACHE_BUDGET_BYTES = 8 * 1024 * 1024
+
+
+class IconLoader(QRunnable):
+    def __init__(self, cache, path, size):
+        super().__init__()
+        self.cache = cache
+        self.path = path
+        self.size = size
+
+    @traced('load_icon')
+    def run(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            self.cache.image_ready.emit(self.path, None, QImage())
+            return
+        reader = QImageReader(variant_for(self.path, max(self.size.width(), self.size.height())))
+        reader.setAutoTransform(True)
+        source = reader.size()
+        if source.isValid() and (source.width() > self.size.width() or source.height() > self.size.height()):
+            # Let the decoder downscale; JPEGs are decoded at the reduced size directly.
+            reader.setScaledSize(source.scaled(self.size, Qt.KeepAspectRatio))
+        self.cache.image_ready.emit(self.path, mtime, reader.read())
+
+
+class StatTask(QRunnable):
+    def __init__(self, cache, keys):
+        super().__init__()
+        self.cache = cache
+        self.keys = keys
+
+    @traced('check_icons')
+    def run(self):
+        changed = []
+        for path, mtime in self.keys:
+            try:
+                current = os.stat(path).st_mtime_ns
+            except OSError:
+                current = None
+            if current != mtime:
+                changed.append(path)
+        if changed:
+            self.cache.files_changed.emit(changed)
+
+
+class IconCache(QObject):
+    # Emitted from worker threads, delivered queued on the GUI thread.
+    image_ready = pyqtSignal(str, object, QImage)
+    files_changed = pyqtSignal(list)
+    icon_ready = pyqtSignal(str)
+    # Cached icons that were dropped because their file changed.
+    icons_changed = pyqtSignal(list)
+
+    def __init__(self, size, default_icon, budget=CACHE_BUDGET_BYTES, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.default_icon = default_icon
+        self.budget = budget
+        self.used = 0
+        self.entries = OrderedDict()
+        self.keys = {}
+        self.pending = set()
+        self.failed = set()
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self.image_ready.connect(self.on_image_ready)
+        self.files_changed.connect(self.on_files_changed)
+
+    def icon(self, path):
+        key = self.keys.get(path)
+        if key is not None and key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+        if path not in self.pending and path not in self.failed:
+            self.pending.add(path)
+            self.pool.start(IconLoader(self, path, self.size))
+        return None
+
+    def on_image_ready(self, path, mtime, image):
+        self.pending.discard(path)
+        if image.isNull():
+            self.failed.add(path)
+            return
+        pixmap = QPixmap.fromImage(image)
+        cost = pixmap.width() * pixmap.height() * pixmap.depth() // 8
+        key = (path, mtime)
+        old = self.keys.get(path)
+        if old is not None and old in self.entries:
+            self.used -= self.entries.pop(old)[1]
+        self.entries[key] = (QIcon(pixmap), cost)
+        self.keys[path] = key
+        self.used += cost
+        while self.used > self.budget and len(self.entries) > 1:
+            (evicted_path, _), (_, evicted_cost) = self.entries.popitem(last=False)
+            self.used -= evicted_cost
+            self.keys.pop(evicted_path, None)
+        self.icon_ready.emit(path)
+
+    def revalidate(self):
+        # Lookups never stat; the mtime in each key is compared on a worker
+        # instead, e.g. whenever the panel opens. Failed paths are retried.
+        keys = list(self.entries) + [(path, None) for path in self.failed]
+        if keys:
+            self.pool.start(StatTask(self, keys))
+
+    def on_files_changed(self, paths):
+        for path in paths:
+            self.forget(path)
+        self.icons_changed.emit(paths)
+
+    def forget(self, path):
+        # Drop a path so the next lookup reloads it, e.g. after the file changed.
+        self.failed.discard(path)
+        key = self.keys.pop(path, None)
+        if key in self.entries:
+            self.used -= self.entries.pop(key)[1]
+
+    def clear(self):
+        self.pool.clear()
+        self.entries.clear()
+        self.keys.clear()
+        self.pending.clear()
+        self.failed.clear()
+        self.used = 0
@@ -0,0 +1,103 @@
+import os
+import re
+import hashlib
+import tempfile
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImageReader
+
+ICONS_DIR = 'icons'
+VARIANT_SIZES = (16, 32, 64)
+CHUNK_SIZE = 64 * 1024
+STORED = re.compile(r'^([0-9a-f]{64})-(\d+)\.png$')
+# Keys of the icons this process stored. Several shortcut files can share
+# the directory, so only these are ever collected.
+added = set()
+
+
+# Icons are stored under the hash of the picked file, pre-scaled to each
+# variant size: picking the same image twice stores it once, two files that
+# share a name no longer overwrite each other, and the panel never decodes a
+# full-size original. Shortcuts refer to the largest variant.
+def digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def variant_path(directory, key, size):
+    return os.path.join(directory, f'{key}-{size}.png')
+
+
+def stored_key(path):
+    match = STORED.match(os.path.basename(path or ''))
+    return match.group(1) if match else None
+
+
+def add_icon(source, directory=ICONS_DIR):
+    if stored_key(source) is not None:
+        return source
+    key = digest(source)
+    largest = variant_path(directory, key, VARIANT_SIZES[-1])
+    if os.path.exists(largest):
+        return largest
+    reader = QImageReader(source)
+    reader.setAutoTransform(True)
+    image = reader.read()
+    if image.isNull():
+        raise ValueError(f"Cannot read {source}: {reader.errorString()}")
+    os.makedirs(directory, exist_ok=True)
+    # Smallest first: once the largest exists, all of them do.
+    for size in VARIANT_SIZES:
+        scaled = image
+        if image.width() > size or image.height() > size:
+            scaled = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=f'.{key}-{size}.', suffix='.tmp')
+        os.close(fd)
+        try:
+            if not scaled.save(tmp, 'PNG'):
+                raise OSError(f"Cannot write {tmp}")
+            os.replace(tmp, variant_path(directory, key, size))
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+    added.add(key)
+    return largest
+
+
+def variant_for(path, size):
+    # The smallest stored variant at least `size` pixels across; other
+    # paths are returned unchanged.
+    key = stored_key(path)
+    if key is None:
+        return path
+    for variant in VARIANT_SIZES:
+        if variant >= size:
+            return variant_path(os.path.dirname(path), key, variant)
+    return path
+
+
+def collect(referenced, directory=ICONS_DIR):
+    # Removes the icons this process stored that no shortcut refers to any
+    # more, e.g. picked and then replaced. Whatever was there before may
+    # belong to another shortcut file, and icons copied in under their own
+    # names are left alone too.
+    keep = {stored_key(path) for path in referenced}
+    removed = 0
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return 0
+    for name in names:
+        key = stored_key(name)
+        if key in added and key not in keep:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                continue
+            removed += 1
+    return removed
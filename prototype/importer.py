@@ -0,0 +1,201 @@
+import os
+import csv
+from itertools import chain
+from html.parser import HTMLParser
+from urllib.parse import urlsplit, urlunsplit
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from icon_store import add_icon
+from tracing import traced
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+SKIPPED_SCHEMES = ('javascript', 'place', 'data')
+
+
+def dedupe_key(path):
+    path = path.strip()
+    if '://' in path:
+        parts = urlsplit(path)
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), parts.query, ''))
+    return os.path.normcase(os.path.normpath(os.path.expanduser(path)))
+
+
+class BookmarkParser(HTMLParser):
+    # Netscape bookmark exports are loose HTML: each bookmark is an <A HREF>
+    # whose text is the title. Folders are flattened.
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found = []
+        self.href = None
+        self.text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            self.href = dict(attrs).get('href')
+            self.text = []
+
+    def handle_data(self, data):
+        if self.href is not None:
+            self.text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self.href is not None:
+            href = self.href.strip()
+            if href and urlsplit(href).scheme.lower() not in SKIPPED_SCHEMES:
+                self.found.append((' '.join(''.join(self.text).split()) or href, href, None))
+            self.href = None
+
+
+def read_bookmarks(path):
+    parser = BookmarkParser()
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), ''):
+            parser.feed(chunk)
+            yield from parser.found
+            parser.found.clear()
+    parser.close()
+    yield from parser.found
+
+
+def read_desktop_entry(path):
+    entry = {}
+    section = None
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('['):
+                section = line
+                continue
+            if section != '[Desktop Entry]':
+                continue
+            key, sep, value = line.partition('=')
+            if sep:
+                entry.setdefault(key.strip(), value.strip())
+    return entry
+
+
+def is_launchable(entry):
+    return (entry.get('Type', 'Application') == 'Application' and entry.get('Name')
+            and entry.get('NoDisplay') != 'true' and entry.get('Hidden') != 'true')
+
+
+def read_desktop_dir(path):
+    for root, dirs, files in os.walk(os.path.abspath(path)):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.endswith('.desktop'):
+                continue
+            file = os.path.join(root, name)
+            try:
+                entry = read_desktop_entry(file)
+            except OSError:
+                continue
+            if is_launchable(entry):
+                icon = entry.get('Icon', '')
+                yield entry['Name'], file, icon if os.path.isabs(icon) else None
+
+
+def read_csv(path):
+    # Either a header naming name, path and optionally icon columns, or bare
+    # rows in that order.
+    with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        rows = csv.reader(f)
+        first = next(rows, None)
+        if first is None:
+            return
+        header = [c.strip().lower() for c in first]
+        if 'name' in header and 'path' in header:
+            columns = (header.index('name'), header.index('path'), header.index('icon') if 'icon' in header else None)
+        else:
+            columns = (0, 1, 2)
+            rows = chain([first], rows)
+        for row in rows:
+            name, path, icon = (row[c].strip() if c is not None and c < len(row) else '' for c in columns)
+            if name and path:
+                yield name, path, icon or None
+
+
+def read_source(path):
+    if os.path.isdir(path):
+        return read_desktop_dir(path)
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.html', '.htm'):
+        return read_bookmarks(path)
+    if ext == '.csv':
+        return read_csv(path)
+    raise ValueError(f"Don't know how to import {path}")
+
+
+class ImportTask(QRunnable):
+    def __init__(self, importer, path, seen):
+        super().__init__()
+        self.importer = importer
+        self.path = path
+        self.seen = seen
+
+    @traced('import')
+    def run(self):
+        importer = self.importer
+        batch = []
+        duplicates = 0
+        stored = {}
+        try:
+            for name, path, icon in read_source(self.path):
+                if importer.cancelled:
+                    break
+                key = dedupe_key(path)
+                if key in self.seen:
+                    duplicates += 1
+                    continue
+                self.seen.add(key)
+                if icon:
+                    # Desktop entries share a few icons; each is stored once.
+                    if icon not in stored:
+                        try:
+                            stored[icon] = add_icon(icon)
+                        except (OSError, ValueError):
+                            stored[icon] = None
+                    icon = stored[icon]
+                batch.append({'name': name, 'path': path, 'icon': icon or importer.default_icon})
+                if len(batch) >= BATCH_SIZE:
+                    importer.batch_ready.emit(batch)
+                    batch = []
+        except (OSError, ValueError, csv.Error) as e:
+            if batch:
+                importer.batch_ready.emit(batch)
+            importer.failed.emit(str(e))
+            return
+        if batch:
+            importer.batch_ready.emit(batch)
+        importer.finished.emit(duplicates)
+
+
+class Importer(QObject):
+    # Batches are parsed on a worker and delivered queued on the GUI thread.
+    batch_ready = pyqtSignal(list)
+    finished = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, default_icon, parent=None):
+        super().__init__(parent)
+        self.default_icon = default_icon
+        self.cancelled = False
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+    def start(self, path, existing):
+        # Duplicates are found through a set of normalized paths, seeded with
+        # what is already stored.
+        self.cancelled = False
+        seen = {dedupe_key(s['path']) for s in existing if 'path' in s}
+        self.pool.start(ImportTask(self, path, seen))
+
+    def cancel(self):
+        self.cancelled = True
+
+    def stop(self):
+        # On quit; batches not delivered yet are dropped.
+        self.cancel()
+        self.pool.waitForDone()
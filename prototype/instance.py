@@ -0,0 +1,71 @@
+import os
+import sys
+
+# One Quick Ball per user. The first process listens on a local socket; later
+# invocations send their command there as one line of JSON and print the
+# one-line JSON reply. Every start of the ball checks for a running one first,
+# so socket, json and tempfile are only imported once they are needed.
+CONNECT_TIMEOUT = 5.0
+
+
+def socket_path():
+    path = os.environ.get('QUICKBALL_SOCKET')
+    if path:
+        return path
+    if sys.platform == 'win32':
+        return f"quickball-{os.environ.get('USERNAME', 'user')}"
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    if not runtime:
+        import tempfile
+        runtime = tempfile.gettempdir()
+    return os.path.join(runtime, f'quickball-{os.getuid()}.sock')
+
+
+def encode(message):
+    import json
+    return json.dumps(message).encode('utf-8') + b'\n'
+
+
+def request(command, path=None, timeout=CONNECT_TIMEOUT):
+    # Returns None when no instance is listening. Plain sockets keep the
+    # client free of Qt, so a CLI call costs only the interpreter start.
+    path = path or socket_path()
+    if sys.platform == 'win32':
+        return qt_request(command, path, timeout)
+    if not os.path.exists(path):
+        return None
+    import socket
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        try:
+            client.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return None
+        import json
+        client.sendall(encode({'command': command}))
+        data = b''
+        while not data.endswith(b'\n'):
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    finally:
+        client.close()
+    return json.loads(data) if data else {'ok': False, 'error': 'No reply from Quick Ball'}
+
+
+def qt_request(command, path, timeout):
+    from PyQt5.QtNetwork import QLocalSocket
+    client = QLocalSocket()
+    client.connectToServer(path)
+    if not client.waitForConnected(int(timeout * 1000)):
+        return None
+    import json
+    client.write(encode({'command': command}))
+    client.waitForBytesWritten(int(timeout * 1000))
+    data = b''
+    while not data.endswith(b'\n') and client.waitForReadyRead(int(timeout * 1000)):
+        data += bytes(client.readAll())
+    client.disconnectFromServer()
+    return json.loads(data) if data else {'ok': False, 'error': 'No reply from Quick Ball'}
@@ -0,0 +1,125 @@
+import os
+import sys
+import stat
+import shutil
+import subprocess
+import time
+from urllib.parse import urlparse
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from tracing import traced
+
+URL_SCHEMES = ('http', 'https', 'ftp', 'mailto', 'file')
+# Spawns in flight at once, whatever the size of a launch group.
+LAUNCH_THREADS = 4
+
+
+def classify(path):
+    if urlparse(path).scheme in URL_SCHEMES:
+        return 'url'
+    if path.endswith('.desktop'):
+        return 'desktop'
+    try:
+        mode = os.stat(path).st_mode
+    except OSError:
+        return 'file'
+    # Checked on the mode bits: os.access(X_OK) is always true for root.
+    if stat.S_ISREG(mode) and mode & 0o111:
+        return 'executable'
+    return 'file'
+
+
+def opener():
+    if sys.platform == 'darwin':
+        return ['open']
+    if shutil.which('xdg-open'):
+        return ['xdg-open']
+    return ['gio', 'open']
+
+
+def command_for(path, kind):
+    if kind == 'executable':
+        return [path]
+    if kind == 'desktop':
+        if shutil.which('gio'):
+            return ['gio', 'launch', path]
+        return ['gtk-launch', os.path.basename(path)]
+    return opener() + [path]
+
+
+def spawn(path):
+    kind = classify(path)
+    if sys.platform == 'win32':
+        os.startfile(path)
+        return kind
+    if kind != 'url' and not os.path.exists(path):
+        raise FileNotFoundError(f"No such file: {path}")
+    # Popen returns once exec has succeeded; the child is never waited on
+    # here and gets its own session so it outlives the ball.
+    subprocess.Popen(command_for(path, kind), stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, close_fds=True, start_new_session=True)
+    return kind
+
+
+class LaunchTask(QRunnable):
+    def __init__(self, launcher, path, group=0, member=0):
+        super().__init__()
+        self.launcher = launcher
+        self.path = path
+        self.group = group
+        self.member = member
+
+    @traced('spawn')
+    def run(self):
+        start = time.perf_counter()
+        try:
+            spawn(self.path)
+        except Exception as e:
+            ok, error = False, str(e)
+        else:
+            ok, error = True, ""
+        if self.group:
+            ms = (time.perf_counter() - start) * 1000
+            self.launcher.member_finished.emit(self.group, self.member, ok, error, ms)
+        else:
+            self.launcher.finished.emit(self.path, ok, error)
+
+
+class Launcher(QObject):
+    # path, ok, error message; delivered queued on the GUI thread.
+    finished = pyqtSignal(str, bool, str)
+    # group, member index, ok, error message, spawn time in ms.
+    member_finished = pyqtSignal(int, int, bool, str, float)
+    # group, one (path, ok, error, ms) per member in the order given.
+    group_finished = pyqtSignal(int, list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(LAUNCH_THREADS)
+        self.groups = {}
+        self.last_group = 0
+        self.member_finished.connect(self.on_member_finished)
+
+    def launch(self, path):
+        self.pool.start(LaunchTask(self, path))
+
+    def launch_group(self, paths):
+        # Members queue on the pool, so a large group never has more than
+        # LAUNCH_THREADS spawns running. Returns the id group_finished reports.
+        self.last_group += 1
+        group = self.last_group
+        self.groups[group] = (list(paths), [None] * len(paths), [len(paths)])
+        for member, path in enumerate(paths):
+            self.pool.start(LaunchTask(self, path, group, member))
+        if not paths:
+            del self.groups[group]
+            self.group_finished.emit(group, [])
+        return group
+
+    def on_member_finished(self, group, member, ok, error, ms):
+        paths, results, remaining = self.groups[group]
+        results[member] = (paths[member], ok, error, ms)
+        remaining[0] -= 1
+        if not remaining[0]:
+            del self.groups[group]
+            self.group_finished.emit(group, results)
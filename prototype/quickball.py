@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+from instance import request
+
+RETRY_INTERVAL = 0.05
+
+
+def run(command, wait=0.0):
+    # Sends one command to the running ball and prints its answer. Returns
+    # the exit status, or None when no ball answered within `wait` seconds.
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            reply = request(command)
+        except (OSError, ValueError) as e:
+            print(f"Could not talk to Quick Ball: {e}", file=sys.stderr)
+            return 1
+        if reply is not None or time.monotonic() >= deadline:
+            break
+        time.sleep(RETRY_INTERVAL)
+    if reply is None:
+        return None
+    if command[0] == 'launch' and isinstance(reply.get('result'), list):
+        # A launch group: one line per member, as path, spawn time, outcome.
+        for m in reply['result']:
+            print(f"{m['path']}\t{m['ms']:.1f} ms\t{'ok' if m['ok'] else m['error']}")
+    if not reply.get('ok'):
+        print(reply.get('error', 'Failed'), file=sys.stderr)
+        return 1
+    if command[0] == 'list':
+        for s in reply['result']:
+            print('\t'.join([s['name']] + (s['members'] if 'members' in s else [s['path']])))
+    return 0
+
+
+def main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(prog='quickball', description='Control the running Quick Ball.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    launch = commands.add_parser('launch', help='launch a shortcut or group by name')
+    launch.add_argument('name')
+    commands.add_parser('list', help='print every shortcut as name<TAB>path, '
+                                     'and a group with a path per member')
+    add = commands.add_parser('add', help='add a shortcut')
+    add.add_argument('name')
+    add.add_argument('path')
+    add.add_argument('icon', nargs='?')
+    commands.add_parser('reload', help='re-read the shortcuts file')
+    commands.add_parser('show', help='bring the ball to the front')
+    args = parser.parse_args(argv[1:])
+
+    command = [args.command]
+    if args.command == 'launch':
+        command.append(args.name)
+    elif args.command == 'add':
+        # The ball reads the icon itself, from its own working directory.
+        command += [args.name, args.path] + ([os.path.abspath(args.icon)] if args.icon else [])
+    status = run(command)
+    if status is None:
+        print("Quick Ball is not running", file=sys.stderr)
+        return 3
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,75 @@
+from PyQt5.QtCore import QObject, QPoint, pyqtSignal
+
+# Screens are bucketed into a coarse grid over the virtual desktop, so a
+# point lookup is one division and a check of the one or two screens that
+# overlap its cell.
+CELL = 256
+
+
+def clamp_into(rect, area):
+    x = min(max(rect.x(), area.left()), area.right() - rect.width() + 1)
+    y = min(max(rect.y(), area.top()), area.bottom() - rect.height() + 1)
+    return QPoint(max(x, area.left()), max(y, area.top()))
+
+
+def distance(point, rect):
+    dx = max(rect.left() - point.x(), 0, point.x() - rect.right())
+    dy = max(rect.top() - point.y(), 0, point.y() - rect.bottom())
+    return dx + dy
+
+
+class ScreenMap(QObject):
+    changed = pyqtSignal()
+
+    def __init__(self, app, parent=None):
+        super().__init__(parent)
+        self.app = app
+        self.entries = []
+        self.cells = {}
+        app.screenAdded.connect(self.on_screen_added)
+        app.screenRemoved.connect(self.on_screen_removed)
+        for screen in app.screens():
+            self.watch(screen)
+        self.rebuild()
+
+    def watch(self, screen):
+        screen.geometryChanged.connect(self.on_geometry_changed)
+        screen.availableGeometryChanged.connect(self.on_geometry_changed)
+
+    def on_screen_added(self, screen):
+        self.watch(screen)
+        self.rebuild()
+
+    def on_geometry_changed(self, geometry):
+        self.rebuild()
+
+    def on_screen_removed(self, screen):
+        # The screen may still be listed while it is being torn down.
+        self.rebuild(removed=screen)
+
+    def rebuild(self, removed=None):
+        self.entries = [(s.geometry(), s.availableGeometry(), s) for s in self.app.screens() if s is not removed]
+        self.cells = {}
+        for entry in self.entries:
+            geometry = entry[0]
+            for cx in range(geometry.left() // CELL, geometry.right() // CELL + 1):
+                for cy in range(geometry.top() // CELL, geometry.bottom() // CELL + 1):
+                    self.cells.setdefault((cx, cy), []).append(entry)
+        self.changed.emit()
+
+    def entry_at(self, point):
+        for entry in self.cells.get((point.x() // CELL, point.y() // CELL), ()):
+            if entry[0].contains(point):
+                return entry
+        if not self.entries:
+            return None
+        # Off every screen (in a gap between monitors): use the closest one.
+        return min(self.entries, key=lambda e: distance(point, e[0]))
+
+    def screen_at(self, point):
+        entry = self.entry_at(point)
+        return entry[2] if entry else self.app.primaryScreen()
+
+    def available_at(self, point):
+        entry = self.entry_at(point)
+        return entry[1] if entry else self.app.primaryScreen().availableGeometry()
@@ -0,0 +1,106 @@
+import sys
+from collections.abc import Mapping
+from itertools import count
+
+MISSING = object()
+FIELDS = ('name', 'path', 'icon', 'children')
+_ids = count(1)
+
+
+# A shortcut as a compact record rather than a dict. It still reads like
+# the dicts it replaces (s['name'], s.get('icon'), dict(s, name=...)), and
+# `id` is a stable number for the session that survives edits but is
+# never saved. Anything beyond the fixed fields goes in `extra`.
+class Shortcut(Mapping):
+    __slots__ = ('id', 'name', 'path', 'icon', 'children', 'extra')
+
+    def __getitem__(self, key):
+        if key in FIELDS:
+            value = getattr(self, key)
+            if value is MISSING:
+                raise KeyError(key)
+            return value
+        if self.extra is None:
+            raise KeyError(key)
+        return self.extra[key]
+
+    # Mapping's versions go through __getitem__ and KeyError, which is slow
+    # for the fields most shortcuts do not have.
+    def get(self, key, default=None):
+        if key in FIELDS:
+            value = getattr(self, key)
+            return default if value is MISSING else value
+        return default if self.extra is None else self.extra.get(key, default)
+
+    def __contains__(self, key):
+        if key in FIELDS:
+            return getattr(self, key) is not MISSING
+        return self.extra is not None and key in self.extra
+
+    def __setitem__(self, key, value):
+        if key in FIELDS:
+            setattr(self, key, value)
+        elif self.extra is None:
+            self.extra = {key: value}
+        else:
+            self.extra[key] = value
+
+    def __iter__(self):
+        for key in FIELDS:
+            if getattr(self, key) is not MISSING:
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(getattr(self, key) is not MISSING for key in FIELDS) + len(self.extra or ())
+
+    def as_dict(self):
+        # What gets saved; much quicker than dict(self) for the JSON writer.
+        d = {'name': self.name}
+        if self.path is not MISSING:
+            d['path'] = self.path
+        if self.icon is not MISSING:
+            d['icon'] = self.icon
+        if self.children is not MISSING:
+            d['children'] = self.children
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+    def __repr__(self):
+        return f"Shortcut({self.id}, {dict(self)!r})"
+
+
+def record(data, shortcut_id=None):
+    if shortcut_id is None and isinstance(data, Shortcut):
+        return data
+    get = data.get
+    s = Shortcut.__new__(Shortcut)
+    s.id = next(_ids) if shortcut_id is None else shortcut_id
+    s.name = data['name']
+    s.path = path = get('path', MISSING)
+    icon = get('icon', MISSING)
+    # Most shortcuts share a handful of icon files; keep one copy of each path.
+    s.icon = sys.intern(icon) if icon.__class__ is str else icon
+    s.children = children = get('children', MISSING)
+    if children is not MISSING and children:
+        records(children)
+    known = 1 + (path is not MISSING) + (icon is not MISSING) + (children is not MISSING)
+    s.extra = {k: v for k, v in data.items() if k not in FIELDS} if len(data) > known else None
+    return s
+
+
+def targets(shortcut):
+    # What launching a shortcut opens: its path, or every member of a group.
+    members = shortcut.get('members')
+    if members is not None:
+        return [m['path'] for m in members]
+    path = shortcut.get('path')
+    return [] if path is None else [path]
+
+
+def records(shortcuts):
+    # In place: the lists themselves are shared with models and the backend.
+    shortcuts[:] = [record(s) for s in shortcuts]
+    return shortcuts
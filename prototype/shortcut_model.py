@@ -0,0 +1,231 @@
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QPersistentModelIndex, QMimeData, QByteArray
+from PyQt5.QtGui import QColor
+from shortcut import targets
+
+ROWS_MIME_TYPE = 'application/x-quickball-rows'
+BROKEN_COLOR = QColor(200, 60, 60)
+
+
+def inside(level, shortcut):
+    children = shortcut.get('children')
+    return children is not None and (children is level or any(inside(level, s) for s in children))
+
+
+# One model per open list: the top level (level=None) or a folder's
+# children. Models sharing a `models` registry can drop rows on each other.
+class ShortcutModel(QAbstractListModel):
+    def __init__(self, store, icon_cache, parent=None, level=None, models=None, folder_icon=None, health=None):
+        super().__init__(parent)
+        self.store = store
+        self.level = level
+        self.shortcuts = store.level(level)
+        self.models = models
+        if models is not None:
+            models[id(self.shortcuts)] = self
+        self.folder_icon = folder_icon
+        self.icon_cache = icon_cache
+        self.icon_cache.icon_ready.connect(self.on_icon_ready)
+        self.icon_cache.icons_changed.connect(self.on_icons_changed)
+        self.waiting = {}
+        # Target path -> rows that showed its health, to repaint just those.
+        self.shown = {}
+        self.health = health
+        if health is not None:
+            health.changed.connect(self.on_health_changed)
+        if level is None:
+            store.rows_loading.connect(self.on_rows_loading)
+            store.rows_loaded.connect(self.on_rows_loaded)
+
+    def on_rows_loading(self, row, count):
+        self.beginInsertRows(QModelIndex(), row, row + count - 1)
+
+    def on_rows_loaded(self, row, count):
+        self.endInsertRows()
+
+    def icon(self, index, path):
+        if not path:
+            return self.icon_cache.default_icon
+        icon = self.icon_cache.icon(path)
+        if icon is None:
+            # Persistent, so rows inserted or moved meanwhile still get theirs.
+            self.waiting.setdefault(path, set()).add(QPersistentModelIndex(index))
+            return self.icon_cache.default_icon
+        return icon
+
+    def on_icon_ready(self, path):
+        for waiting in self.waiting.pop(path, ()):
+            if waiting.isValid():
+                index = self.index(waiting.row())
+                self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def on_icons_changed(self, paths):
+        # Rare: an icon file was changed on disk. Only rows on screen repaint.
+        if self.shortcuts:
+            self.dataChanged.emit(self.index(0), self.index(len(self.shortcuts) - 1), [Qt.DecorationRole])
+
+    def on_health_changed(self, paths):
+        for path in paths:
+            shown = self.shown.get(path)
+            if not shown:
+                continue
+            for row in [i for i in shown if not i.isValid()]:
+                shown.discard(row)
+            for row in shown:
+                index = self.index(row.row())
+                self.dataChanged.emit(index, index, [Qt.ForegroundRole, Qt.ToolTipRole])
+
+    def is_broken(self, index, s):
+        if self.health is None:
+            return False
+        broken = False
+        for t in targets(s):
+            self.shown.setdefault(t, set()).add(QPersistentModelIndex(index))
+            broken = self.health.is_broken(t) or broken
+        return broken
+
+    # PyQt hands out a copy when a dict goes through a QVariant, so callers
+    # that need the stored object itself use this rather than Qt.UserRole.
+    def shortcut(self, index):
+        return self.shortcuts[index.row()]
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.shortcuts)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        s = self.shortcuts[index.row()]
+        if role == Qt.DisplayRole:
+            return s['name']
+        if role == Qt.DecorationRole:
+            if 'children' in s and self.folder_icon is not None and not s.get('icon'):
+                return self.folder_icon
+            return self.icon(index, s.get('icon'))
+        if role == Qt.ToolTipRole:
+            if self.is_broken(index, s):
+                return 'Not found: ' + ', '.join(t for t in targets(s) if self.health.is_broken(t))
+            if 'members' in s:
+                return ', '.join(m['name'] for m in s['members'])
+            return s.get('path', s['name'])
+        if role == Qt.ForegroundRole:
+            return BROKEN_COLOR if self.is_broken(index, s) else None
+        if role == Qt.UserRole:
+            return s
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+        if 'children' in self.shortcuts[index.row()]:
+            flags |= Qt.ItemIsDropEnabled
+        return flags
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def mimeTypes(self):
+        return [ROWS_MIME_TYPE]
+
+    def mimeData(self, indexes):
+        # Only the source list and row numbers travel through the drag; the
+        # view moves rows within a list with moveRows, dropMimeData does the rest.
+        mime = QMimeData()
+        rows = ','.join(str(i.row()) for i in indexes)
+        mime.setData(ROWS_MIME_TYPE, QByteArray(f"{id(self.shortcuts)}:{rows}".encode()))
+        return mime
+
+    def dropMimeData(self, data, action, row, column, parent):
+        if action != Qt.MoveAction or self.models is None or not data.hasFormat(ROWS_MIME_TYPE):
+            return False
+        key, _, rows = bytes(data.data(ROWS_MIME_TYPE)).decode().partition(':')
+        source = self.models.get(int(key))
+        if source is None:
+            return False
+        rows = sorted({int(r) for r in rows.split(',') if r})
+        if parent.isValid():
+            # Dropped onto a folder: append to its contents.
+            if 'children' not in self.shortcuts[parent.row()] or source is self and parent.row() in rows:
+                return False
+            level = self.store.children(self.level, parent.row())
+            row = len(level)
+        elif source is self:
+            return False
+        else:
+            level = self.shortcuts
+            row = row if row >= 0 else len(level)
+        if any(inside(level, source.shortcuts[r]) for r in rows):
+            return False
+        target = self.models.get(id(level))
+        for r in reversed(rows):
+            source.beginRemoveRows(QModelIndex(), r, r)
+            if target is not None:
+                target.beginInsertRows(QModelIndex(), row, row)
+            self.store.move_to(source.level, r, 1, level, row)
+            if target is not None:
+                target.endInsertRows()
+            source.endRemoveRows()
+        return True
+
+    def moveRows(self, source_parent, source_row, count, dest_parent, dest_row):
+        if not self.beginMoveRows(source_parent, source_row, source_row + count - 1, dest_parent, dest_row):
+            return False
+        self.store.move(source_row, count, dest_row, self.level)
+        self.endMoveRows()
+        return True
+
+    def append(self, shortcut):
+        row = len(self.shortcuts)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.store.insert(row, shortcut, self.level)
+        self.endInsertRows()
+
+    def extend(self, shortcuts):
+        row = len(self.shortcuts)
+        self.beginInsertRows(QModelIndex(), row, row + len(shortcuts) - 1)
+        self.store.extend(shortcuts)
+        self.endInsertRows()
+
+    def update(self, row, shortcut):
+        self.store.update(row, shortcut, self.level)
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def remove(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.store.remove(row, self.level)
+        self.endRemoveRows()
+
+    def reset(self):
+        self.waiting.clear()
+        self.shown.clear()
+        self.beginResetModel()
+        self.endResetModel()
+
+
+# Read-only list shown instead of the store order, e.g. search results or
+# the frecency ranking.
+class SnapshotModel(ShortcutModel):
+    def __init__(self, store, icon_cache, parent=None, folder_icon=None, health=None):
+        super().__init__(store, icon_cache, parent, folder_icon=folder_icon, health=health)
+        self.shortcuts = []
+
+    def on_rows_loading(self, row, count):
+        pass
+
+    def on_rows_loaded(self, row, count):
+        pass
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def set_results(self, results):
+        self.waiting.clear()
+        self.shown.clear()
+        self.beginResetModel()
+        self.shortcuts = results
+        self.endResetModel()
@@ -0,0 +1,616 @@
+import os
+import sys
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QPushButton, QFileDialog, QLineEdit, QLabel,
+                             QDialog, QHBoxLayout, QMessageBox, QListView, QAbstractItemView, QMenu,
+                             QProgressDialog, QListWidget, QInputDialog, QStyle, QProgressBar)
+from PyQt5.QtGui import QColor, QIcon, QPixmap
+from PyQt5.QtCore import Qt, QSize, QRect, QPoint, QPersistentModelIndex
+from shortcut import targets
+from shortcut_model import ShortcutModel, SnapshotModel
+from icon_cache import IconCache
+from icon_store import ICONS_DIR, add_icon
+from launcher import Launcher
+from health import get_health_checker
+from frecency import FrecencyRanking, get_tracker
+from screen_map import clamp_into
+import tracing
+
+USAGE_FILE = 'usage.log'
+DEFAULT_ICON = os.path.join(ICONS_DIR, 'default.png')
+ICON_SIZE = 24
+SEARCH_LIMIT = 50
+FOLDER_WIDTH = 260
+
+
+# The default icon is drawn in memory; shortcuts still refer to DEFAULT_ICON
+# by path, and a path that cannot be loaded falls back to this pixmap.
+def default_pixmap():
+    pixmap = QPixmap(32, 32)
+    pixmap.fill(QColor(180, 180, 180))
+    return pixmap
+
+class ShortcutDialog(QDialog):
+    def __init__(self, parent=None, data=None):
+        super().__init__(parent)
+        self.setWindowTitle("Shortcut")
+        self.icon_path = data['icon'] if data else DEFAULT_ICON
+        self.app_index = None
+        self.app_results = []
+
+        self.name_input = QLineEdit(data['name'] if data else "")
+        self.path_input = QLineEdit(data['path'] if data else "")
+
+        browse_button = QPushButton("Browse")
+        browse_button.clicked.connect(self.browse_file)
+
+        icon_button = QPushButton("Choose Icon")
+        icon_button.clicked.connect(self.choose_icon)
+
+        add_button = QPushButton("Save")
+        add_button.clicked.connect(self.accept_data)
+
+        layout = QVBoxLayout()
+        if sys.platform.startswith('linux'):
+            self.setFixedSize(300, 380)
+            self.add_app_search(layout)
+        else:
+            self.setFixedSize(300, 200)
+        layout.addWidget(QLabel("Name:"))
+        layout.addWidget(self.name_input)
+        layout.addWidget(QLabel("Path or URL:"))
+
+        path_row = QHBoxLayout()
+        path_row.addWidget(self.path_input)
+        path_row.addWidget(browse_button)
+        layout.addLayout(path_row)
+
+        layout.addWidget(icon_button)
+        layout.addWidget(add_button)
+        self.setLayout(layout)
+
+    def add_app_search(self, layout):
+        from app_index import get_app_index
+        self.app_index = get_app_index()
+        self.app_search = QLineEdit()
+        self.app_search.setPlaceholderText("Search installed applications")
+        self.app_search.textChanged.connect(self.show_apps)
+        self.app_list = QListWidget()
+        self.app_list.setMaximumHeight(120)
+        self.app_list.itemClicked.connect(self.pick_app)
+        layout.addWidget(self.app_search)
+        layout.addWidget(self.app_list)
+        self.app_index.ready.connect(self.show_apps)
+        self.app_index.load()
+        self.show_apps()
+
+    def show_apps(self):
+        self.app_list.clear()
+        if not self.app_index.is_ready():
+            self.app_list.addItem("Loading applications...")
+            self.app_results = []
+            return
+        self.app_results = self.app_index.search(self.app_search.text())
+        self.app_list.addItems([app['name'] for app in self.app_results])
+
+    def pick_app(self, item):
+        row = self.app_list.row(item)
+        if row >= len(self.app_results):
+            return
+        from app_index import resolve_icon
+        app = self.app_results[row]
+        self.name_input.setText(app['name'])
+        self.path_input.setText(app['path'])
+        icon = resolve_icon(app['icon'])
+        if icon:
+            try:
+                self.icon_path = add_icon(icon)
+            except (OSError, ValueError):
+                pass
+
+    def done(self, result):
+        if self.app_index is not None:
+            self.app_index.ready.disconnect(self.show_apps)
+            self.app_index = None
+        super().done(result)
+
+    def browse_file(self):
+        file, _ = QFileDialog.getOpenFileName(self, "Select File")
+        if file:
+            self.path_input.setText(file)
+
+    def choose_icon(self):
+        file, _ = QFileDialog.getOpenFileName(self, "Choose Icon", filter="Images (*.png *.jpg *.bmp)")
+        if file:
+            try:
+                self.icon_path = add_icon(file)
+            except (OSError, ValueError) as e:
+                QMessageBox.warning(self, "Icon", f"Could not use this image:\n{e}")
+
+    def accept_data(self):
+        if not self.name_input.text() or not self.path_input.text():
+            QMessageBox.warning(self, "Missing Info", "Both name and path are required.")
+            return
+        self.accept()
+
+    def get_data(self):
+        return self.name_input.text(), self.path_input.text(), self.icon_path
+
+# A folder's contents, opened beside the row that holds it. Everything but
+# the list itself is handled by the panel that owns it.
+class FolderPanel(QWidget):
+    def __init__(self, panel, model):
+        super().__init__(panel)
+        self.setWindowFlags(Qt.Popup)
+        self.setFixedWidth(FOLDER_WIDTH)
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        self.title = QLabel()
+        layout.addWidget(self.title)
+        self.list_view = panel.make_list_view()
+        self.list_view.setModel(model)
+        layout.addWidget(self.list_view)
+
+
+class ShortcutPanel(QWidget):
+    @tracing.traced('ShortcutPanel')
+    def __init__(self, store, parent_ball):
+        super().__init__(parent_ball)
+        self.store = store
+        self.shortcuts = store.load()
+        self.generation = store.generation
+        self.parent_ball = parent_ball
+        self.frecency = get_tracker(USAGE_FILE)
+        self.ranking = None
+        self.ranking_state = None
+        self.sort_by_frecency = False
+        self.importer = None
+        self.import_progress = None
+        self.imported = 0
+        # Models and popups exist only for folders that have been opened.
+        self.models = {}
+        self.folder_panels = {}
+        self.setWindowFlags(Qt.Popup)
+        self.setFixedWidth(300)
+
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(self.filter_list)
+        self.search_input.returnPressed.connect(self.launch_top_hit)
+        self.layout.addWidget(self.search_input)
+
+        self.list_view = self.make_list_view()
+
+        icon_size = QSize(ICON_SIZE, ICON_SIZE) * self.devicePixelRatioF()
+        self.icon_cache = IconCache(icon_size, QIcon(default_pixmap()), parent=self)
+        self.folder_icon = self.style().standardIcon(QStyle.SP_DirIcon)
+        # Targets are stat'ed on workers; broken rows are drawn in red.
+        self.health = get_health_checker()
+        self.model = ShortcutModel(self.store, self.icon_cache, self, models=self.models,
+                                   folder_icon=self.folder_icon, health=self.health)
+        self.results = SnapshotModel(self.store, self.icon_cache, self, self.folder_icon, self.health)
+        self.ranked = SnapshotModel(self.store, self.icon_cache, self, self.folder_icon, self.health)
+        self.launcher = Launcher(self)
+        self.launcher.finished.connect(self.on_launch_finished)
+        self.launcher.group_finished.connect(self.on_group_finished)
+        self.group_names = {}
+        self.list_view.setModel(self.model)
+
+        self.layout.addWidget(self.list_view)
+
+        # Shown while a large file is still streaming in; the list can be
+        # scrolled, searched and launched from meanwhile.
+        self.load_bar = QProgressBar()
+        self.load_bar.setTextVisible(False)
+        self.load_bar.setMaximumHeight(6)
+        self.load_bar.setVisible(store.loading)
+        self.load_bar.setRange(0, 0)
+        self.layout.addWidget(self.load_bar)
+
+        button_row = QHBoxLayout()
+        add_btn = QPushButton("+ Add Shortcut")
+        add_btn.clicked.connect(self.add_shortcut)
+        button_row.addWidget(add_btn)
+        import_btn = QPushButton("Import")
+        import_menu = QMenu(import_btn)
+        import_menu.addAction("Bookmarks or CSV File...", self.import_file)
+        import_menu.addAction("Folder of Desktop Entries...", self.import_folder)
+        import_btn.setMenu(import_menu)
+        button_row.addWidget(import_btn)
+        sort_btn = QPushButton("Most Used")
+        sort_btn.setCheckable(True)
+        sort_btn.toggled.connect(self.set_sort_by_frecency)
+        button_row.addWidget(sort_btn)
+        self.layout.addLayout(button_row)
+
+        self.store.changed.connect(self.on_store_changed)
+        self.store.load_progress.connect(self.on_load_progress)
+        self.store.load_finished.connect(self.on_load_finished)
+
+    def make_list_view(self):
+        # Uniform item sizes skip per-row size hints and batched layout lets the
+        # first screen paint before the rest of a long list has been laid out.
+        # Drops are accepted from the other lists too, to move between folders.
+        view = QListView()
+        view.setUniformItemSizes(True)
+        view.setLayoutMode(QListView.Batched)
+        view.setIconSize(QSize(ICON_SIZE, ICON_SIZE))
+        view.setDragDropMode(QAbstractItemView.DragDrop)
+        view.setDefaultDropAction(Qt.MoveAction)
+        # Several rows can be selected to make a launch group of them.
+        view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        view.setSpacing(5)
+        view.setContextMenuPolicy(Qt.CustomContextMenu)
+        view.customContextMenuRequested.connect(lambda pos: self.show_context_menu(view, pos))
+        view.doubleClicked.connect(lambda index: self.activate(view, index))
+        return view
+
+    def refresh(self):
+        self.store.load()
+        if self.generation != self.store.generation:
+            self.populate_list()
+        elif self.sort_by_frecency:
+            self.filter_list(self.search_input.text())
+
+    def on_load_progress(self, done, total):
+        self.load_bar.setRange(0, total)
+        self.load_bar.setValue(min(done, total))
+        self.load_bar.show()
+
+    def on_load_finished(self):
+        self.load_bar.hide()
+        # Search results and the ranking were made from part of the list.
+        if self.list_view.model() is not self.model:
+            self.filter_list(self.search_input.text())
+
+    def on_store_changed(self):
+        if self.isVisible():
+            self.refresh()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.search_input.setFocus()
+        self.icon_cache.revalidate()
+        # Cached results stand until their directory changes, and rows queue
+        # their own targets as they are painted.
+        self.health.revalidate()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.search_input.clear()
+        # A focused line edit keeps its cursor blink timer running while hidden.
+        self.search_input.clearFocus()
+        for folder_panel in self.folder_panels.values():
+            folder_panel.close()
+
+    @tracing.traced('populate_list')
+    def populate_list(self):
+        # A reload replaces every folder's list, so their models and popups go.
+        self.generation = self.store.generation
+        self.load_bar.setRange(0, 0)
+        self.load_bar.setVisible(self.store.loading)
+        for folder_panel in self.folder_panels.values():
+            folder_panel.close()
+            folder_panel.deleteLater()
+        self.folder_panels.clear()
+        self.models.clear()
+        self.models[id(self.shortcuts)] = self.model
+        self.model.reset()
+        self.filter_list(self.search_input.text())
+
+    def set_sort_by_frecency(self, enabled):
+        self.sort_by_frecency = enabled
+        self.filter_list(self.search_input.text())
+
+    def current_ranking_state(self):
+        return self.store.revision, self.frecency.version
+
+    def show_ranked(self):
+        # The ranking is only rebuilt when the shortcuts changed or something
+        # else (the command socket) recorded a launch; launches from the panel
+        # reposition single entries in it.
+        if self.ranking is None or self.ranking_state != self.current_ranking_state():
+            self.ranking = FrecencyRanking(self.frecency, self.store.leaves())
+            self.ranking_state = self.current_ranking_state()
+        self.ranked.set_results(self.ranking.shortcuts())
+        if self.list_view.model() is not self.ranked:
+            self.list_view.setModel(self.ranked)
+
+    def filter_list(self, text):
+        if not text.strip():
+            if self.sort_by_frecency:
+                self.show_ranked()
+            elif self.list_view.model() is not self.model:
+                self.list_view.setModel(self.model)
+            return
+        self.results.set_results(self.store.search(text, SEARCH_LIMIT))
+        if self.list_view.model() is not self.results:
+            self.list_view.setModel(self.results)
+        self.list_view.setCurrentIndex(self.results.index(0))
+
+    def launch_top_hit(self):
+        if self.list_view.model() is self.results and self.results.rowCount():
+            self.activate(self.list_view, self.results.index(0))
+
+    def model_for(self, level):
+        model = self.models.get(id(self.store.level(level)))
+        if model is None:
+            model = ShortcutModel(self.store, self.icon_cache, self, level, self.models, self.folder_icon, self.health)
+        return model
+
+    def target(self, index):
+        # The model and row to edit through, also for search results and the
+        # ranking, which only show copies of the order. None when the row is
+        # gone, e.g. the list was reloaded while a menu or dialog was open.
+        if not index.isValid():
+            return None
+        model = index.model()
+        if isinstance(model, SnapshotModel):
+            level, row = self.store.locate(model.shortcut(index))
+            if row < 0:
+                return None
+            return self.model_for(level), row
+        return model, index.row()
+
+    def activate(self, view, index):
+        shortcut = index.model().shortcut(index)
+        if 'children' in shortcut:
+            self.open_folder(view, index)
+        elif 'members' in shortcut:
+            self.launch_group(index)
+        else:
+            self.launch_item(index)
+
+    def open_folder(self, view, index):
+        target = self.target(index)
+        if target is None:
+            return
+        model, row = target
+        children = self.store.children(model.level, row)
+        folder_panel = self.folder_panels.get(id(children))
+        if folder_panel is None:
+            folder_panel = FolderPanel(self, self.model_for(children))
+            self.folder_panels[id(children)] = folder_panel
+        folder_panel.title.setText(model.shortcuts[row]['name'])
+        # Beside the list it was opened from, level with the folder's row.
+        window = view.window().frameGeometry()
+        top = view.viewport().mapToGlobal(view.visualRect(index).topLeft()).y()
+        area = self.parent_ball.screens.available_at(QPoint(window.right(), top))
+        folder_panel.adjustSize()
+        size = folder_panel.frameGeometry().size()
+        x = window.right() + 1
+        if x + size.width() > area.x() + area.width():
+            x = window.left() - size.width()
+        folder_panel.move(clamp_into(QRect(QPoint(x, top), size), area))
+        folder_panel.show()
+
+    def forget_folder(self, shortcut):
+        for s in self.store.walk([shortcut]):
+            if s.get('children') is not None:
+                folder_panel = self.folder_panels.pop(id(s['children']), None)
+                if folder_panel is not None:
+                    folder_panel.close()
+                    folder_panel.deleteLater()
+                self.models.pop(id(s['children']), None)
+
+    def list_model(self, view):
+        # Where new entries from a context menu go: the list the view shows,
+        # or the top level while it shows search results or the ranking.
+        model = view.model()
+        return self.model if isinstance(model, SnapshotModel) else model
+
+    def add_shortcut(self):
+        dialog = ShortcutDialog(self)
+        if dialog.exec_():
+            name, path, icon = dialog.get_data()
+            # Appended rows go after everything still loading.
+            self.store.get()
+            self.model.append({'name': name, 'path': path, 'icon': icon})
+
+    def import_file(self):
+        file, _ = QFileDialog.getOpenFileName(self, "Import Shortcuts",
+                                              filter="Bookmarks or CSV (*.html *.htm *.csv)")
+        if file:
+            self.start_import(file)
+
+    def import_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Import Desktop Entries")
+        if folder:
+            self.start_import(folder)
+
+    def start_import(self, path):
+        if self.importer is None:
+            from importer import Importer
+            self.importer = Importer(DEFAULT_ICON, self)
+            self.importer.batch_ready.connect(self.on_import_batch)
+            self.importer.finished.connect(self.on_import_finished)
+            self.importer.failed.connect(self.on_import_failed)
+        # The panel is a popup and may close under the file dialog, so
+        # progress and results are shown over the ball.
+        self.import_progress = QProgressDialog("Importing shortcuts...", "Cancel", 0, 0, self.parent_ball)
+        self.import_progress.setWindowModality(Qt.WindowModal)
+        self.import_progress.canceled.connect(self.importer.cancel)
+        self.import_progress.show()
+        self.imported = 0
+        self.store.get()
+        self.store.begin_bulk()
+        self.importer.start(path, self.store.leaves())
+
+    def stop_import(self):
+        if self.importer is not None:
+            self.importer.stop()
+
+    def on_import_batch(self, batch):
+        self.model.extend(batch)
+        self.imported += len(batch)
+        self.import_progress.setLabelText(f"Imported {self.imported} shortcuts...")
+
+    def on_import_finished(self, duplicates):
+        self.end_import()
+        QMessageBox.information(self.parent_ball, "Import",
+                                f"Imported {self.imported} shortcuts, skipped {duplicates} duplicates.")
+
+    def on_import_failed(self, error):
+        self.end_import()
+        QMessageBox.critical(self.parent_ball, "Import Failed",
+                             f"Imported {self.imported} shortcuts before an error:\n{error}")
+
+    def end_import(self):
+        self.store.end_bulk()
+        self.import_progress.close()
+        self.import_progress.deleteLater()
+        self.import_progress = None
+        self.filter_list(self.search_input.text())
+
+    def show_context_menu(self, view, pos):
+        index = view.indexAt(pos)
+        menu = QMenu(self)
+        edit_action = pin_action = delete_action = trace_action = group_action = None
+        if index.isValid():
+            shortcut = index.model().shortcut(index)
+            if 'children' in shortcut:
+                edit_action = menu.addAction("Rename")
+            else:
+                edit_action = menu.addAction("Rename" if 'members' in shortcut else "Edit")
+                pin_action = menu.addAction("Unpin" if shortcut.get('pinned') else "Pin")
+            delete_action = menu.addAction("Delete")
+        folder_action = menu.addAction("New Folder")
+        selected = self.selected_shortcuts(view)
+        if len(selected) > 1:
+            group_action = menu.addAction(f"New Group of {len(selected)}")
+        if tracing.ENABLED:
+            trace_action = menu.addAction("Save Trace")
+        # Follows the row if it moves while the menu is open, and turns
+        # invalid if the list is reset.
+        index = QPersistentModelIndex(index)
+        action = menu.exec_(view.mapToGlobal(pos))
+
+        if action is None:
+            return
+        if action == trace_action:
+            self.save_trace()
+        elif action == folder_action:
+            self.new_folder(self.list_model(view))
+        elif action == group_action:
+            self.new_group(self.list_model(view), selected)
+        elif action == edit_action:
+            self.edit_shortcut(index)
+        elif action == pin_action:
+            self.toggle_pinned(index)
+        elif action == delete_action:
+            self.delete_shortcut(index)
+
+    def save_trace(self):
+        try:
+            path = tracing.dump()
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Failed to save trace:\n{e}")
+            return
+        QMessageBox.information(self, "Trace Saved", f"Trace written to {path}")
+
+    def new_folder(self, model):
+        name, ok = QInputDialog.getText(self, "New Folder", "Name:")
+        if ok and name.strip():
+            self.store.get()
+            model.append({'name': name.strip(), 'children': []})
+            self.filter_list(self.search_input.text())
+
+    def selected_shortcuts(self, view):
+        # Groups are made of single targets, so folders and groups are left out.
+        model = view.model()
+        rows = sorted(i.row() for i in view.selectionModel().selectedIndexes())
+        return [s for s in (model.shortcuts[r] for r in rows) if 'path' in s]
+
+    def new_group(self, model, members):
+        name, ok = QInputDialog.getText(self, "New Group", "Name:")
+        if ok and name.strip():
+            self.store.get()
+            group = {'name': name.strip(), 'members': [{'name': s['name'], 'path': s['path']} for s in members]}
+            if members[0].get('icon'):
+                group['icon'] = members[0]['icon']
+            model.append(group)
+            self.filter_list(self.search_input.text())
+
+    def edit_shortcut(self, index):
+        if not index.isValid():
+            return
+        shortcut = index.model().shortcut(index)
+        if 'children' in shortcut or 'members' in shortcut:
+            title = "Rename Folder" if 'children' in shortcut else "Rename Group"
+            name, ok = QInputDialog.getText(self, title, "Name:", text=shortcut['name'])
+            if not ok or not name.strip():
+                return
+            data = dict(shortcut, name=name.strip())
+        else:
+            dialog = ShortcutDialog(self, shortcut)
+            if not dialog.exec_():
+                return
+            name, path, icon = dialog.get_data()
+            self.icon_cache.forget(icon)
+            data = dict(shortcut, name=name, path=path, icon=icon)
+        target = self.target(index)
+        if target is None:
+            return
+        model, row = target
+        model.update(row, data)
+        self.filter_list(self.search_input.text())
+
+    def toggle_pinned(self, index):
+        target = self.target(index)
+        if target is None:
+            return
+        model, row = target
+        data = dict(model.shortcuts[row])
+        if not data.pop('pinned', False):
+            data['pinned'] = True
+        model.update(row, data)
+        self.filter_list(self.search_input.text())
+
+    def delete_shortcut(self, index):
+        target = self.target(index)
+        if target is None:
+            return
+        model, row = target
+        self.forget_folder(model.shortcuts[row])
+        model.remove(row)
+        self.filter_list(self.search_input.text())
+
+    @tracing.traced('launch_item')
+    def launch_item(self, index):
+        data = index.model().shortcut(index)
+        current = self.ranking is not None and self.ranking_state == self.current_ranking_state()
+        self.frecency.record(data['path'])
+        if current:
+            self.ranking.bump(data)
+            self.ranking_state = self.current_ranking_state()
+        self.launcher.launch(data['path'])
+        self.close()
+
+    @tracing.traced('launch_group')
+    def launch_group(self, index):
+        # Every member's score moves, so the ranking is rebuilt next time
+        # rather than bumped.
+        data = index.model().shortcut(index)
+        paths = targets(data)
+        for path in paths:
+            self.frecency.record(path)
+        self.group_names[self.launcher.launch_group(paths)] = data['name']
+        self.close()
+
+    def on_group_finished(self, group, results):
+        name = self.group_names.pop(group, None)
+        failed = [(path, error) for path, ok, error, ms in results if not ok]
+        if not failed:
+            return
+        self.health.check([path for path, error in failed], force=True)
+        lines = '\n'.join(f"{path}: {error}" for path, error in failed)
+        QMessageBox.critical(self.parent_ball, "Error",
+                             f"{len(failed)} of {len(results)} in {name} failed to open:\n{lines}")
+
+    def on_launch_finished(self, path, ok, error):
+        if not ok:
+            self.health.check([path], force=True)
+            QMessageBox.critical(self.parent_ball, "Error", f"Failed to open {path}:\n{error}")
@@ -0,0 +1,615 @@
+import os
+import sys
+import shutil
+import threading
+from PyQt5.QtCore import (QObject, QCoreApplication, QEvent, QFileSystemWatcher, QRunnable, QThreadPool, pyqtSignal,
+                          pyqtSlot)
+from storage import file_stamp, open_backend, iter_json_array
+from fuzzy_index import FuzzyIndex
+from shortcut import record, records
+from tracing import traced
+
+# Files smaller than this are quicker to read in one go.
+PROGRESSIVE_MIN_BYTES = 256 * 1024
+# Enough rows to fill the panel; it is sent on its own so it shows at once.
+FIRST_PAGE = 64
+LOAD_BATCH = 2000
+
+
+class LoadTask(QRunnable):
+    def __init__(self, loader, path, generation):
+        super().__init__()
+        self.loader = loader
+        self.path = path
+        self.generation = generation
+
+    @traced('load_progressive')
+    def run(self):
+        loader = self.loader
+        batch = []
+        size = FIRST_PAGE
+        done = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for entry, done in iter_json_array(f):
+                    if loader.cancelled:
+                        return
+                    batch.append(record(entry))
+                    if len(batch) >= size:
+                        loader.batch_ready.emit(self.generation, batch, done)
+                        batch = []
+                        size = LOAD_BATCH
+        except (OSError, ValueError) as e:
+            if batch:
+                loader.batch_ready.emit(self.generation, batch, done)
+            loader.failed.emit(self.generation, str(e))
+            return
+        if batch:
+            loader.batch_ready.emit(self.generation, batch, done)
+        loader.finished.emit(self.generation)
+
+
+class Loader(QObject):
+    # generation, records, characters read so far; queued to the GUI thread.
+    batch_ready = pyqtSignal(int, list, int)
+    finished = pyqtSignal(int)
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cancelled = False
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+    def start(self, path, generation):
+        self.cancelled = False
+        self.pool.start(LoadTask(self, path, generation))
+
+    def cancel(self):
+        self.cancelled = True
+
+    def wait(self):
+        self.pool.waitForDone()
+
+
+def copying_walk(shortcuts):
+    # Like ShortcutStore.walk, but each list is copied as it is reached: the
+    # GUI thread may change them meanwhile, and reports those changes itself.
+    for s in list(shortcuts):
+        yield s
+        if s.get('children'):
+            yield from copying_walk(s['children'])
+
+
+class Indexer(QObject):
+    # Builds a FuzzyIndex on a thread of its own, like WriteBehind: a pool
+    # would wait for the build, holding the GIL it needs, when the store is
+    # deleted. generation, FuzzyIndex; queued to the GUI thread.
+    built = pyqtSignal(int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.generation = 0
+        self.thread = None
+
+    def start(self, shortcuts, generation):
+        # A build still running for an older list stops at its next entry.
+        self.generation = generation
+        self.thread = threading.Thread(target=self.run, args=(shortcuts, generation), name='shortcut-indexer',
+                                       daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        self.generation = -1
+
+    @traced('build_index')
+    def run(self, shortcuts, generation):
+        index = FuzzyIndex()
+        for s in copying_walk(shortcuts):
+            if self.generation != generation:
+                return
+            index.add(s)
+        try:
+            self.built.emit(generation, index)
+        except RuntimeError:
+            # The store was deleted while this was building.
+            pass
+
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+
+
+class ShortcutStore(QObject):
+    changed = pyqtSignal()
+    # Rows appended by a progressive load: (first row, count) before and
+    # after they are added, as beginInsertRows/endInsertRows want them.
+    rows_loading = pyqtSignal(int, int)
+    rows_loaded = pyqtSignal(int, int)
+    # Characters read and the file size while loading, then load_finished.
+    load_progress = pyqtSignal(int, int)
+    load_finished = pyqtSignal()
+    # A save that did not reach the file, with the reason.
+    save_failed = pyqtSignal(str)
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.shortcuts = []
+        self.stamp = None
+        self.stale = True
+        self.generation = 0
+        self.revision = 0
+        self.index = None
+        # Changes made while the index is built on a worker, applied once it
+        # arrives; None when no build is running.
+        self.indexing = None
+        self.indexer = None
+        # Shortcut id -> (level, row), built on first use, then kept in step:
+        # a change redoes only the rows it shifted.
+        self.locations = None
+        self.bulk_start = None
+        # False while some folder may still be unread (SQLite reads them lazily).
+        self.complete = False
+        # Whether the list is all of the file as last read, i.e. that file
+        # read without errors. Unused icons are only collected when it is.
+        self.intact = False
+        self.loader = None
+        self.loading = False
+        self.load_size = 0
+        # Set when a write had to wait for a load or a bulk to end.
+        self.save_pending = False
+
+        # Watch the directory as well as the file: editors and atomic saves
+        # replace the file, which drops it from the watcher.
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.addPath(os.path.dirname(os.path.abspath(path)))
+        self.watcher.fileChanged.connect(self.invalidate)
+        self.watcher.directoryChanged.connect(self.invalidate)
+        self.watch_file()
+
+        self.backend = open_backend(path)
+        if self.backend.saved is not None:
+            self.backend.saved.connect(self.on_saved)
+        if self.backend.failed is not None:
+            self.backend.failed.connect(self.on_save_failed)
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.close)
+
+    def watch_file(self):
+        if os.path.exists(self.path) and self.path not in self.watcher.files():
+            self.watcher.addPath(self.path)
+
+    def invalidate(self, _path=None):
+        self.watch_file()
+        if not self.backend.is_idle() or self.bulk_start is not None:
+            # Our own save is in flight or about to be; on_saved records the
+            # resulting stamp.
+            return
+        stamp = file_stamp(self.path)
+        if stamp == self.backend.written_stamp:
+            self.stamp = stamp
+        if stamp != self.stamp:
+            self.stale = True
+            self.changed.emit()
+
+    def get(self):
+        # Always the whole list: a progressive load still running is finished
+        # first, unless the file has changed since it started.
+        if self.stale:
+            self.reload()
+        else:
+            self.finish_loading()
+        return self.shortcuts
+
+    def load(self):
+        # Like get(), but a large JSON file is read on a worker and its rows
+        # arrive through rows_loading/rows_loaded, the first page straight away.
+        if self.loading or not self.stale:
+            return self.shortcuts
+        stamp = file_stamp(self.path)
+        if (not self.backend.progressive or stamp is None or stamp == self.stamp
+                or stamp[1] < PROGRESSIVE_MIN_BYTES):
+            return self.get()
+        self.stale = False
+        self.stamp = stamp
+        self.load_size = stamp[1]
+        self.shortcuts.clear()
+        self.generation += 1
+        self.revision += 1
+        self.index = None
+        self.indexing = None
+        self.locations = None
+        self.complete = not self.backend.lazy_folders
+        self.intact = False
+        self.loading = True
+        if self.loader is None:
+            self.loader = Loader(self)
+            self.loader.batch_ready.connect(self.on_load_batch)
+            self.loader.finished.connect(self.on_load_finished)
+            self.loader.failed.connect(self.on_load_failed)
+        self.loader.start(self.path, self.generation)
+        return self.shortcuts
+
+    # Real slots, so the queued calls are posted to the store itself and
+    # finish_loading() can deliver them.
+    @pyqtSlot(int, list, int)
+    def on_load_batch(self, generation, batch, done):
+        if generation != self.generation:
+            return
+        row = len(self.shortcuts)
+        self.rows_loading.emit(row, len(batch))
+        self.shortcuts.extend(batch)
+        self.reindex('add', self.walk(batch))
+        self.relocate(None, row, new=batch)
+        self.revision += 1
+        self.rows_loaded.emit(row, len(batch))
+        self.load_progress.emit(done, self.load_size)
+
+    @pyqtSlot(int)
+    def on_load_finished(self, generation):
+        if generation != self.generation:
+            return
+        self.loading = False
+        self.intact = True
+        if self.save_pending and self.bulk_start is None:
+            self.save_pending = False
+            self.backend.save_all(self.shortcuts)
+            self.after_write()
+        if self.index is None:
+            self.build_index()
+        self.load_finished.emit()
+
+    @pyqtSlot(int, str)
+    def on_load_failed(self, generation, error):
+        # Keep the rows read so far, as reload() keeps the old list, and copy
+        # the file aside before anything can be saved over it.
+        if generation != self.generation:
+            return
+        self.keep_corrupt(error)
+        self.on_load_finished(generation)
+        self.intact = False
+
+    def finish_loading(self):
+        # Waits for the worker, then delivers the batches it has queued.
+        if self.loading:
+            self.loader.wait()
+            QCoreApplication.sendPostedEvents(self, QEvent.MetaCall)
+
+    def cancel_loading(self):
+        # Stops a load whose rows are no longer wanted. They stay in the list
+        # until the next reload, which the store is marked as needing.
+        if self.loading:
+            self.loader.cancel()
+            self.loader.wait()
+            self.generation += 1
+            self.loading = False
+            self.stamp = None
+            self.stale = True
+
+    def write(self, method, *args):
+        # While a progressive load runs the list is incomplete and writing it
+        # would drop the rest of the file. During a bulk the backend has not
+        # seen the bulk rows yet, so row numbers would not match. Either way
+        # the list is saved whole once the load or the bulk ends.
+        if self.loading or self.bulk_start is not None:
+            self.save_pending = True
+        else:
+            getattr(self.backend, method)(self.shortcuts, *args)
+
+    def reload(self):
+        # A load still running read the file as it was. Its rows are only
+        # waited for when edits are held back to be saved with them.
+        if self.save_pending:
+            self.finish_loading()
+        else:
+            self.cancel_loading()
+        self.stale = False
+        stamp = file_stamp(self.path)
+        if stamp is not None and stamp == self.stamp:
+            return
+        shortcuts = []
+        if stamp is not None:
+            try:
+                shortcuts = self.backend.load()
+            except (OSError, ValueError) as e:
+                self.keep_corrupt(e)
+                self.stamp = stamp
+                return
+        self.stamp = stamp
+        # Update in place so panels holding the list see the new contents.
+        self.shortcuts[:] = records(shortcuts)
+        self.generation += 1
+        self.revision += 1
+        self.locations = None
+        self.complete = not self.backend.lazy_folders
+        self.intact = True
+        self.build_index()
+
+    def build_index(self):
+        # Ready before the first keystroke: built on a worker from what is
+        # loaded, while changes made meanwhile are noted in `indexing`.
+        # Folders read later join it as they are read.
+        self.index = None
+        self.indexing = []
+        if self.indexer is None:
+            self.indexer = Indexer(self)
+            self.indexer.built.connect(self.on_index_built)
+            self.destroyed.connect(self.indexer.cancel)
+        self.indexer.start(self.shortcuts, self.generation)
+
+    @pyqtSlot(int, object)
+    def on_index_built(self, generation, index):
+        if generation != self.generation or self.indexing is None:
+            return
+        for method, s in self.indexing:
+            getattr(index, method)(s)
+        self.index = index
+        self.indexing = None
+
+    def finish_indexing(self):
+        if self.indexing is not None:
+            self.indexer.wait()
+            QCoreApplication.sendPostedEvents(self, QEvent.MetaCall)
+
+    def drop_index(self):
+        # Stops keeping the index in step, e.g. while an import adds rows
+        # faster than they can be indexed on the GUI thread. A build still
+        # running is stopped and whatever it already sent is ignored.
+        self.index = None
+        if self.indexing is not None:
+            self.indexing = None
+            self.indexer.cancel()
+            self.indexer.wait()
+            QCoreApplication.sendPostedEvents(self, QEvent.MetaCall)
+
+    def reindex(self, method, shortcuts):
+        # Keeps the search index in step, or notes the change for the one
+        # being built.
+        if self.indexing is not None:
+            self.indexing.extend((method, s) for s in shortcuts)
+        elif self.index is not None:
+            apply = getattr(self.index, method)
+            for s in shortcuts:
+                apply(s)
+
+    def force_reload(self):
+        # Re-read even if the file looks unchanged, e.g. when asked to from the
+        # CLI. Pending writes go out first so they are not lost.
+        self.close()
+        self.stamp = None
+        self.reload()
+        self.changed.emit()
+
+    def keep_corrupt(self, error):
+        # Keep what we have in memory and copy the unreadable file aside so
+        # the next save cannot destroy whatever is left in it.
+        self.intact = False
+        backup = self.path + '.corrupt'
+        print(f"Could not read {self.path} ({error}); keeping a copy in {backup}", file=sys.stderr)
+        try:
+            shutil.copyfile(self.path, backup)
+        except OSError:
+            pass
+
+    # Folders hold their contents in a 'children' list. Mutations take the
+    # list they apply to as `level`, None being the top level.
+    def level(self, level=None):
+        return self.shortcuts if level is None else level
+
+    def children(self, level, row):
+        # The SQLite backend reads a folder's contents the first time it is opened.
+        folder = self.level(level)[row]
+        if folder['children'] is None:
+            folder['children'] = records(self.backend.load_children(self.shortcuts, row, level))
+            self.reindex('add', self.walk(folder['children']))
+            if self.locations is not None:
+                self.map_level(folder['children'])
+        return folder['children']
+
+    def materialize(self, level=None):
+        # Reads every folder nobody has opened yet, for the features that
+        # cover the whole tree: search, Most Used, health checks, import
+        # dedupe and the command line list.
+        for row, s in enumerate(self.level(level)):
+            if 'children' in s:
+                self.materialize(self.children(level, row))
+
+    def read_folders(self):
+        if not self.complete and not self.loading:
+            self.materialize()
+            self.complete = True
+
+    def walk(self, shortcuts=None):
+        # The whole tree, folders included, depth first; or just `shortcuts`
+        # and what is loaded below them.
+        if shortcuts is None:
+            self.read_folders()
+            shortcuts = self.shortcuts
+        for s in shortcuts:
+            yield s
+            if s.get('children'):
+                yield from self.walk(s['children'])
+
+    def leaves(self):
+        return [s for s in self.walk() if 'children' not in s]
+
+    # Mutations update the in-memory list and hand the backend just the
+    # affected rows; the JSON backend still rewrites the whole file.
+    def insert(self, row, shortcut, level=None):
+        shortcut = record(shortcut)
+        self.level(level).insert(row, shortcut)
+        self.relocate(level, row, new=[shortcut])
+        self.write('insert', row, level)
+        self.reindex('add', self.walk([shortcut]))
+        self.after_write()
+
+    def extend(self, shortcuts):
+        row = len(self.shortcuts)
+        shortcuts = records(list(shortcuts))
+        self.shortcuts.extend(shortcuts)
+        self.relocate(None, row, new=shortcuts)
+        self.reindex('add', shortcuts)
+        if self.bulk_start is None:
+            self.write('extend', row, len(shortcuts))
+            self.after_write()
+        else:
+            self.revision += 1
+
+    # Rows appended between begin_bulk() and end_bulk() reach the backend
+    # in one write.
+    def begin_bulk(self):
+        self.bulk_start = len(self.shortcuts)
+        self.drop_index()
+
+    def end_bulk(self):
+        row, self.bulk_start = self.bulk_start, None
+        if self.save_pending and not self.loading:
+            self.save_pending = False
+            self.backend.save_all(self.shortcuts)
+            self.after_write()
+        elif row is not None and row < len(self.shortcuts):
+            self.write('extend', row, len(self.shortcuts) - row)
+            self.after_write()
+        if row is not None and not self.loading:
+            self.build_index()
+
+    def update(self, row, shortcut, level=None):
+        # The edited entry is a new record under the old id.
+        items = self.level(level)
+        old = items[row]
+        shortcut = items[row] = record(shortcut, old.id)
+        self.write('update', row, level)
+        self.reindex('remove', [old])
+        self.reindex('add', [shortcut])
+        self.after_write()
+
+    def remove(self, row, level=None):
+        items = self.level(level)
+        if self.index is not None or self.indexing is not None or self.locations is not None:
+            removed = list(self.walk(items[row:row + 1]))
+            self.reindex('remove', removed)
+            if self.locations is not None:
+                for s in removed:
+                    self.locations.pop(s.id, None)
+        del items[row]
+        self.relocate(level, row)
+        self.write('delete', row, level)
+        self.after_write()
+
+    def move(self, source, count, dest, level=None):
+        items = self.level(level)
+        moved = items[source:source + count]
+        del items[source:source + count]
+        if dest > source:
+            dest -= count
+        items[dest:dest] = moved
+        self.relocate(level, min(source, dest), max(source, dest) + count)
+        self.write('move', source, count, dest, level)
+        self.after_write()
+
+    def move_to(self, source_level, source, count, dest_level, dest):
+        # Between two different lists, e.g. into or out of a folder. The
+        # shortcuts keep their identity, so the search index is unaffected.
+        src, dst = self.level(source_level), self.level(dest_level)
+        moved = src[source:source + count]
+        del src[source:source + count]
+        dst[dest:dest] = moved
+        self.relocate(source_level, source)
+        self.relocate(dest_level, dest)
+        if self.indexing is not None:
+            # The build may have read the destination before and the source
+            # after the move.
+            self.reindex('add', self.walk(moved))
+        self.write('move_to', source_level, source, count, dest_level, dest)
+        self.after_write()
+
+    @traced('save')
+    def save(self):
+        self.write('save_all')
+        self.after_write()
+
+    def referenced_icons(self):
+        return self.backend.icons(self.get())
+
+    def find(self, field, value):
+        return self.backend.find(self.shortcuts, field, value)
+
+    def search(self, query, limit):
+        # The index is normally built when a load ends; a build still running
+        # is waited for.
+        if self.index is None and self.indexing is None and not self.loading:
+            self.get()
+        self.finish_indexing()
+        if self.index is None:
+            self.index = FuzzyIndex(self.walk(self.shortcuts))
+        self.read_folders()
+        return self.index.search(query, limit)
+
+    def locate(self, shortcut):
+        # (level, row) of a shortcut anywhere in the loaded tree; row is -1
+        # if it is not there.
+        if self.locations is None:
+            self.locations = {}
+            self.map_level(None)
+        return self.locations.get(shortcut.id, (None, -1))
+
+    def map_level(self, level):
+        for row, s in enumerate(self.level(level)):
+            self.locations[s.id] = (level, row)
+            if s.get('children'):
+                self.map_level(s['children'])
+
+    def relocate(self, level, start, stop=None, new=()):
+        # Rows start..stop of one list have shifted. What is inside their
+        # folders keeps its (level, row), except in the `new` shortcuts.
+        if self.locations is None:
+            return
+        items = self.level(level)
+        for row in range(start, len(items) if stop is None else stop):
+            self.locations[items[row].id] = (level, row)
+        for s in new:
+            if s.get('children'):
+                self.map_level(s['children'])
+
+    def after_write(self):
+        self.stale = False
+        self.revision += 1
+        if self.backend.saved is None:
+            self.on_saved(self.backend.written_stamp)
+
+    def on_saved(self, stamp):
+        self.stamp = stamp
+        self.watch_file()
+
+    @pyqtSlot(str)
+    def on_save_failed(self, error):
+        self.save_failed.emit(error)
+
+    def close(self):
+        # On quit: a load is only finished if edits wait to be saved with it.
+        if not self.save_pending:
+            self.cancel_loading()
+        self.flush()
+
+    def flush(self):
+        # Also on quit: an import still open is saved as far as it got, with
+        # whatever writes it held back.
+        self.finish_loading()
+        if self.bulk_start is not None:
+            self.end_bulk()
+        self.backend.flush()
+        # A failure of the last save is reported even when the event loop has
+        # already stopped, as on quit.
+        QCoreApplication.sendPostedEvents(self, QEvent.MetaCall)
+
+
+_store = None
+
+
+def get_store(path):
+    global _store
+    if _store is None:
+        _store = ShortcutStore(path)
+    return _store
@@ -0,0 +1,406 @@
+import os
+import sys
+import json
+import sqlite3
+from write_behind import WriteBehind
+from tracing import traced
+
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE):
+    # The entries of a file holding one JSON array, decoded one at a time as
+    # the file is read, with how many characters have been consumed so far.
+    # Like json.load, nothing but whitespace may follow the array.
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = consumed = 0
+    expect = '['
+    error = None
+    eof = False
+    while True:
+        while pos < len(buf) and buf[pos] in WHITESPACE:
+            pos += 1
+        if pos < len(buf):
+            c = buf[pos]
+            if expect == '[':
+                if c != '[':
+                    raise ValueError("Expected a JSON array")
+                expect = 'first'
+                pos += 1
+                continue
+            if expect == 'end':
+                raise ValueError(f"Extra data at character {consumed - len(buf) + pos}")
+            if c == ']' and expect in ('first', ','):
+                expect = 'end'
+                pos += 1
+                continue
+            if expect == ',':
+                if c != ',':
+                    raise ValueError(f"Expected ',' or ']' at character {consumed - len(buf) + pos}")
+                expect = 'entry'
+                pos += 1
+                continue
+            try:
+                entry, end = decoder.raw_decode(buf, pos)
+            except ValueError as e:
+                # Most likely cut off at the end of the buffer; read on.
+                error = e
+            else:
+                # A value running up to the end of the buffer may be cut off too.
+                if end < len(buf) or eof:
+                    pos = end
+                    expect = ','
+                    error = None
+                    yield entry, consumed - len(buf) + pos
+                    continue
+        if eof:
+            if expect == 'end':
+                return
+            raise error or ValueError("Unexpected end of file")
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        consumed += len(chunk)
+        buf = buf[pos:] + chunk
+        pos = 0
+
+
+# Whole-file JSON storage: every change schedules a rewrite through WriteBehind.
+# Folders are nested in the file, so a change anywhere rewrites all of it.
+class JsonBackend:
+    # Large files can be read a page at a time with iter_json_array.
+    progressive = True
+    # Folders arrive with the rest of the file.
+    lazy_folders = False
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = WriteBehind(path, file_stamp)
+        self.saved = self.writer.saved
+        self.failed = self.writer.failed
+
+    @property
+    def written_stamp(self):
+        return self.writer.written_stamp
+
+    def is_idle(self):
+        return self.writer.is_idle()
+
+    @traced('load_json')
+    def load(self):
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def load_children(self, shortcuts, row, level=None):
+        return []
+
+    def insert(self, shortcuts, row, level=None):
+        self.writer.schedule(shortcuts)
+
+    def extend(self, shortcuts, row, count, level=None):
+        self.writer.schedule(shortcuts)
+
+    def update(self, shortcuts, row, level=None):
+        self.writer.schedule(shortcuts)
+
+    def delete(self, shortcuts, row, level=None):
+        self.writer.schedule(shortcuts)
+
+    def move(self, shortcuts, source, count, row, level=None):
+        self.writer.schedule(shortcuts)
+
+    def move_to(self, shortcuts, source_level, source, count, dest_level, row):
+        self.writer.schedule(shortcuts)
+
+    def save_all(self, shortcuts):
+        self.writer.schedule(shortcuts)
+
+    def icons(self, shortcuts):
+        found = set()
+        for s in shortcuts:
+            found.add(s.get('icon'))
+            if s.get('children'):
+                found |= self.icons(s['children'])
+        return found
+
+    def find(self, shortcuts, field, value):
+        found = []
+        for s in shortcuts:
+            if s.get(field) == value and 'children' not in s:
+                found.append(s)
+            elif s.get('children'):
+                found.extend(self.find(s['children'], field, value))
+        return found
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.flush()
+
+
+TABLE = """
+CREATE TABLE IF NOT EXISTS shortcuts (
+    id INTEGER PRIMARY KEY,
+    parent INTEGER REFERENCES shortcuts(id),
+    position REAL NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    icon TEXT,
+    extra TEXT,
+    folder INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS shortcuts_name ON shortcuts(name);
+CREATE INDEX IF NOT EXISTS shortcuts_path ON shortcuts(path);
+CREATE INDEX IF NOT EXISTS shortcuts_position ON shortcuts(position);
+CREATE INDEX IF NOT EXISTS shortcuts_parent ON shortcuts(parent, position);
+"""
+
+COLUMNS = ('name', 'path', 'icon', 'children')
+MIN_GAP = 1e-9
+INSERT = 'INSERT INTO shortcuts (parent, position, name, path, icon, extra, folder) VALUES (?, ?, ?, ?, ?, ?, ?)'
+SELECT = 'SELECT id, position, name, path, icon, extra, folder FROM shortcuts'
+
+
+def split_row(shortcut):
+    extra = {k: v for k, v in shortcut.items() if k not in COLUMNS}
+    return (shortcut['name'], shortcut.get('path', ''), shortcut.get('icon'),
+            json.dumps(extra) if extra else None, int('children' in shortcut))
+
+
+def join_row(name, path, icon, extra, folder=0):
+    # A folder's children stay None until load_children() reads them, and a
+    # launch group has members instead of a path of its own.
+    extra = json.loads(extra) if extra else None
+    if folder:
+        shortcut = {'name': name, 'children': None}
+    elif extra and 'members' in extra:
+        shortcut = {'name': name}
+    else:
+        shortcut = {'name': name, 'path': path}
+    if icon is not None:
+        shortcut['icon'] = icon
+    if extra:
+        shortcut.update(extra)
+    return shortcut
+
+
+class Level:
+    # Row ids and positions of one loaded list: the top level or a folder.
+    __slots__ = ('parent', 'ids', 'positions')
+
+    def __init__(self, parent, ids, positions):
+        self.parent = parent
+        self.ids = ids
+        self.positions = positions
+
+
+# Row-level SQLite storage. Order lives in a REAL position column so a move
+# or insert only writes the rows involved: they take positions between
+# their new neighbours. Folder contents point at the folder's row through
+# `parent`, are read the first time the folder is opened, and moving a
+# shortcut into another folder rewrites that one row.
+class SqliteBackend:
+    progressive = False
+    lazy_folders = True
+
+    def __init__(self, path):
+        self.path = path
+        self.saved = None
+        self.failed = None
+        self.written_stamp = None
+        self.root = Level(None, [], [])
+        # Loaded folders, keyed by the id() of their children list.
+        self.levels = {}
+        self.db = sqlite3.connect(path)
+        self.db.executescript(TABLE)
+        columns = {row[1] for row in self.db.execute('PRAGMA table_info(shortcuts)')}
+        if 'parent' not in columns:
+            self.db.execute('ALTER TABLE shortcuts ADD COLUMN parent INTEGER REFERENCES shortcuts(id)')
+        if 'folder' not in columns:
+            self.db.execute('ALTER TABLE shortcuts ADD COLUMN folder INTEGER NOT NULL DEFAULT 0')
+        self.db.executescript(INDEXES)
+
+    def is_idle(self):
+        return True
+
+    @traced('commit_sqlite')
+    def commit(self):
+        self.db.commit()
+        self.written_stamp = file_stamp(self.path)
+
+    def level(self, shortcuts, level):
+        if level is None or level is shortcuts:
+            return self.root
+        return self.levels[id(level)]
+
+    def read_level(self, parent):
+        try:
+            if parent is None:
+                rows = self.db.execute(f'{SELECT} WHERE parent IS NULL ORDER BY position').fetchall()
+            else:
+                rows = self.db.execute(f'{SELECT} WHERE parent = ? ORDER BY position', (parent,)).fetchall()
+        except sqlite3.DatabaseError as e:
+            raise ValueError(str(e))
+        return [join_row(*r[2:]) for r in rows], Level(parent, [r[0] for r in rows], [r[1] for r in rows])
+
+    @traced('load_sqlite')
+    def load(self):
+        items, self.root = self.read_level(None)
+        self.levels = {}
+        return items
+
+    def load_children(self, shortcuts, row, level=None):
+        items, lvl = self.read_level(self.level(shortcuts, level).ids[row])
+        self.levels[id(items)] = lvl
+        return items
+
+    def gap_positions(self, lvl, row, count):
+        positions = lvl.positions
+        if row > 0:
+            low = positions[row - 1]
+        else:
+            low = (positions[0] if positions else 0.0) - count - 1
+        high = positions[row] if row < len(positions) else low + count + 1
+        step = (high - low) / (count + 1)
+        if step < MIN_GAP:
+            self.renumber(lvl)
+            return self.gap_positions(lvl, row, count)
+        return [low + step * (i + 1) for i in range(count)]
+
+    def renumber(self, lvl):
+        lvl.positions[:] = [float(i) for i in range(len(lvl.ids))]
+        self.db.executemany('UPDATE shortcuts SET position = ? WHERE id = ?', zip(lvl.positions, lvl.ids))
+
+    def insert_tree(self, cur, parent, position, shortcut):
+        cur.execute(INSERT, (parent, position) + split_row(shortcut))
+        row_id = cur.lastrowid
+        children = shortcut.get('children')
+        if children is not None:
+            ids = [self.insert_tree(cur, row_id, float(i), s) for i, s in enumerate(children)]
+            self.levels[id(children)] = Level(row_id, ids, [float(i) for i in range(len(ids))])
+        return row_id
+
+    def insert(self, shortcuts, row, level=None):
+        self.extend(shortcuts, row, 1, level)
+
+    def extend(self, shortcuts, row, count, level=None):
+        lvl = self.level(shortcuts, level)
+        items = shortcuts if level is None else level
+        positions = self.gap_positions(lvl, row, count)
+        cur = self.db.cursor()
+        ids = [self.insert_tree(cur, lvl.parent, p, s) for p, s in zip(positions, items[row:row + count])]
+        lvl.ids[row:row] = ids
+        lvl.positions[row:row] = positions
+        self.commit()
+
+    def update(self, shortcuts, row, level=None):
+        items = shortcuts if level is None else level
+        self.db.execute('UPDATE shortcuts SET name = ?, path = ?, icon = ?, extra = ?, folder = ? WHERE id = ?',
+                        split_row(items[row]) + (self.level(shortcuts, level).ids[row],))
+        self.commit()
+
+    def delete(self, shortcuts, row, level=None):
+        lvl = self.level(shortcuts, level)
+        # A folder takes its whole subtree with it, loaded or not.
+        doomed = [r[0] for r in self.db.execute(
+            'WITH RECURSIVE subtree(id) AS (SELECT ? UNION ALL '
+            'SELECT s.id FROM shortcuts s JOIN subtree ON s.parent = subtree.id) SELECT id FROM subtree',
+            (lvl.ids[row],))]
+        self.db.executemany('DELETE FROM shortcuts WHERE id = ?', ((i,) for i in doomed))
+        doomed = set(doomed)
+        self.levels = {k: v for k, v in self.levels.items() if v.parent not in doomed}
+        del lvl.ids[row]
+        del lvl.positions[row]
+        self.commit()
+
+    def move(self, shortcuts, source, count, row, level=None):
+        # `row` is where the block starts once it has been taken out.
+        self.move_to(shortcuts, level, source, count, level, row)
+
+    def move_to(self, shortcuts, source_level, source, count, dest_level, row):
+        src = self.level(shortcuts, source_level)
+        dst = self.level(shortcuts, dest_level)
+        moved = src.ids[source:source + count]
+        del src.ids[source:source + count]
+        del src.positions[source:source + count]
+        positions = self.gap_positions(dst, row, count)
+        dst.ids[row:row] = moved
+        dst.positions[row:row] = positions
+        if src is dst:
+            self.db.executemany('UPDATE shortcuts SET position = ? WHERE id = ?', zip(positions, moved))
+        else:
+            self.db.executemany('UPDATE shortcuts SET parent = ?, position = ? WHERE id = ?',
+                                ((dst.parent, p, i) for p, i in zip(positions, moved)))
+        self.commit()
+
+    def materialize(self, shortcuts, level=None):
+        items = shortcuts if level is None else level
+        for row, s in enumerate(items):
+            if 'children' in s:
+                if s['children'] is None:
+                    s['children'] = self.load_children(shortcuts, row, level)
+                self.materialize(shortcuts, s['children'])
+
+    def save_all(self, shortcuts):
+        # Everything is rewritten, so folders nobody opened are read first.
+        self.materialize(shortcuts)
+        self.db.execute('DELETE FROM shortcuts')
+        cur = self.db.cursor()
+        self.levels = {}
+        ids = [self.insert_tree(cur, None, float(i), s) for i, s in enumerate(shortcuts)]
+        self.root = Level(None, ids, [float(i) for i in range(len(ids))])
+        self.commit()
+
+    def icons(self, shortcuts):
+        # Every row, including folders nobody has opened.
+        return {r[0] for r in self.db.execute('SELECT DISTINCT icon FROM shortcuts')}
+
+    def find(self, shortcuts, field, value):
+        if field not in ('name', 'path'):
+            raise ValueError(f"Cannot look up shortcuts by {field!r}")
+        rows = self.db.execute(f'SELECT name, path, icon, extra FROM shortcuts WHERE {field} = ? AND folder = 0 '
+                               'ORDER BY position', (value,)).fetchall()
+        return [join_row(*r) for r in rows]
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.db.close()
+
+
+def open_backend(path):
+    if os.path.splitext(path)[1] in ('.db', '.sqlite', '.sqlite3'):
+        return SqliteBackend(path)
+    return JsonBackend(path)
+
+
+def import_json(json_path, db_path):
+    with open(json_path, 'r') as f:
+        shortcuts = json.load(f)
+    backend = SqliteBackend(db_path)
+    backend.save_all(shortcuts)
+    backend.close()
+    return len(shortcuts)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'import':
+        print("usage: storage.py import SHORTCUTS.json SHORTCUTS.db", file=sys.stderr)
+        sys.exit(2)
+    count = import_json(sys.argv[2], sys.argv[3])
+    print(f"Imported {count} shortcuts into {sys.argv[3]}")
@@ -1,6 +1,5 @@
 import sys
 import os
-import json
 import subprocess
 import webbrowser
 import shutil
@@ -8,20 +7,19 @@ from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QPushButton, QF
                              QLineEdit, QLabel, QDialog, QHBoxLayout, QMessageBox)
 from PyQt5.QtGui import QPainter, QColor, QIcon, QPixmap
 from PyQt5.QtCore import Qt, QPoint
+from shortcut_store import get_store
 
 SHORTCUTS_FILE = 'shortcuts.json'
 ICONS_DIR = 'icons'
 DEFAULT_ICON = os.path.join(ICONS_DIR, 'default.png')
 
-if not os.path.exists(ICONS_DIR):
-    os.makedirs(ICONS_DIR)
-
-if not os.path.exists(DEFAULT_ICON):
-    app = QApplication(sys.argv)
-    default_icon = QPixmap(32, 32)
-    default_icon.fill(QColor(200, 200, 200))
-    default_icon.save(DEFAULT_ICON)
-    del app
+def ensure_default_icon():
+    if not os.path.exists(ICONS_DIR):
+        os.makedirs(ICONS_DIR)
+    if not os.path.exists(DEFAULT_ICON):
+        default_icon = QPixmap(32, 32)
+        default_icon.fill(QColor(200, 200, 200))
+        default_icon.save(DEFAULT_ICON)
 
 class ShortcutDialog(QDialog):
     def __init__(self, parent=None):
@@ -78,9 +76,10 @@ class ShortcutDialog(QDialog):
             QMessageBox.warning(self, "Warning", "Both name and path/URL are required.")
 
 class ShortcutPanel(QWidget):
-    def __init__(self, shortcuts, parent):
+    def __init__(self, store, parent):
         super().__init__()
-        self.shortcuts = shortcuts
+        self.store = store
+        self.shortcuts = store.get()
         self.parent = parent
         self.setWindowFlags(Qt.Popup)
         self.setFixedWidth(250)
@@ -158,8 +157,7 @@ class ShortcutPanel(QWidget):
         self.save_and_refresh()
 
     def save_and_refresh(self):
-        with open(SHORTCUTS_FILE, 'w') as file:
-            json.dump(self.shortcuts, file)
+        self.store.save()
         self.refresh_ui()
 
 class QuickBall(QWidget):
@@ -213,25 +211,17 @@ class QuickBall(QWidget):
         pass  # Disabled double click functionality
 
     def show_shortcuts(self):
-        if not os.path.exists(SHORTCUTS_FILE):
-            shortcuts = []
-        else:
-            try:
-                with open(SHORTCUTS_FILE, 'r') as file:
-                    shortcuts = json.load(file)
-            except json.JSONDecodeError:
-                shortcuts = []
-
         if self.panel:
             self.panel.close()
 
-        self.panel = ShortcutPanel(shortcuts, self)
+        self.panel = ShortcutPanel(get_store(SHORTCUTS_FILE), self)
         self.panel.move(self.x() + self.width(), self.y())
         self.panel.show()
         self.panel_open = True
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
+    ensure_default_icon()
     window = QuickBall()
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
@@ -1,14 +1,14 @@
 import sys
 import os
-import json
 import shutil
 import webbrowser
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QPushButton, QFileDialog, QLineEdit,
     QLabel, QDialog, QHBoxLayout, QMessageBox, QScrollArea
 )
-from PyQt5.QtGui import QPainter, QColor, QIcon, QPixmap, QCursor
-from PyQt5.QtCore import Qt, QPoint, QTimer
+from PyQt5.QtGui import QPainter, QColor, QIcon, QPixmap
+from PyQt5.QtCore import Qt, QPoint, QTimer, QPropertyAnimation
+from shortcut_store import get_store
 
 SHORTCUTS_FILE = 'shortcuts.json'
 ICONS_DIR = 'icons'
@@ -82,9 +82,10 @@ class ShortcutDialog(QDialog):
 
 
 class ShortcutPanel(QWidget):
-    def __init__(self, shortcuts, parent_ball):
+    def __init__(self, store, parent_ball):
         super().__init__()
-        self.shortcuts = shortcuts
+        self.store = store
+        self.shortcuts = store.get()
         self.parent_ball = parent_ball
         self.setWindowFlags(Qt.Popup)
         self.setFixedWidth(300)
@@ -175,8 +176,7 @@ class ShortcutPanel(QWidget):
             self.save()
 
     def save(self):
-        with open(SHORTCUTS_FILE, 'w') as f:
-            json.dump(self.shortcuts, f, indent=2)
+        self.store.save()
         self.draw_items()
 
 
@@ -212,10 +212,13 @@ class QuickBall(QWidget):
         self.panel = None
         self.close_zone = CloseZone()
 
-        self.last_mouse_pos = QCursor.pos()
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.fade_if_idle)
-        self.timer.start(10000)
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(10000)
+        self.idle_timer.timeout.connect(lambda: self.fade_to(0.3))
+        self.fade = QPropertyAnimation(self, b"windowOpacity", self)
+        self.fade.setDuration(250)
+        self.idle_timer.start()
 
     def paintEvent(self, event):
         painter = QPainter(self)
@@ -224,12 +227,18 @@ class QuickBall(QWidget):
         painter.setPen(Qt.NoPen)
         painter.drawEllipse(0, 0, self.width(), self.height())
 
-    def fade_if_idle(self):
-        if QCursor.pos() == self.last_mouse_pos:
-            self.setWindowOpacity(0.3)
-        else:
-            self.setWindowOpacity(1.0)
-        self.last_mouse_pos = QCursor.pos()
+    def fade_to(self, opacity):
+        self.fade.stop()
+        self.fade.setStartValue(self.windowOpacity())
+        self.fade.setEndValue(opacity)
+        self.fade.start()
+
+    def enterEvent(self, event):
+        self.idle_timer.stop()
+        self.fade_to(1.0)
+
+    def leaveEvent(self, event):
+        self.idle_timer.start()
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
@@ -254,14 +263,7 @@ class QuickBall(QWidget):
         if self.panel and self.panel.isVisible():
             self.panel.close()
         else:
-            shortcuts = []
-            if os.path.exists(SHORTCUTS_FILE):
-                with open(SHORTCUTS_FILE, 'r') as f:
-                    try:
-                        shortcuts = json.load(f)
-                    except:
-                        pass
-            self.panel = ShortcutPanel(shortcuts, self)
+            self.panel = ShortcutPanel(get_store(SHORTCUTS_FILE), self)
             self.panel.move(self.x() + self.width(), self.y())
             self.panel.show()
 
@@ -1,175 +1,72 @@
+import time
+STARTED = time.perf_counter()
+
 import sys
 import os
-import json
-import subprocess
-import webbrowser
-import shutil
-from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QPushButton, QFileDialog,
-                             QLineEdit, QLabel, QDialog, QHBoxLayout, QMessageBox, QListWidget,
-                             QListWidgetItem, QAbstractItemView, QMenu)
-from PyQt5.QtGui import QPainter, QColor, QIcon, QPixmap
-from PyQt5.QtCore import Qt, QPoint, QTimer
-
-SHORTCUTS_FILE = 'shortcuts.json'
-ICONS_DIR = 'icons'
-DEFAULT_ICON = os.path.join(ICONS_DIR, 'default.png')
-
-# Ensure icons directory and default icon
-def ensure_default_icon():
-    if not os.path.exists(ICONS_DIR):
-        os.makedirs(ICONS_DIR)
-    if not os.path.exists(DEFAULT_ICON):
-        pixmap = QPixmap(32, 32)
-        pixmap.fill(QColor(180, 180, 180))
-        pixmap.save(DEFAULT_ICON)
-
-class ShortcutDialog(QDialog):
-    def __init__(self, parent=None, data=None):
-        super().__init__(parent)
-        self.setWindowTitle("Shortcut")
-        self.setFixedSize(300, 200)
-        self.icon_path = data['icon'] if data else DEFAULT_ICON
-
-        self.name_input = QLineEdit(data['name'] if data else "")
-        self.path_input = QLineEdit(data['path'] if data else "")
-
-        browse_button = QPushButton("Browse")
-        browse_button.clicked.connect(self.browse_file)
-
-        icon_button = QPushButton("Choose Icon")
-        icon_button.clicked.connect(self.choose_icon)
-
-        add_button = QPushButton("Save")
-        add_button.clicked.connect(self.accept_data)
-
-        layout = QVBoxLayout()
-        layout.addWidget(QLabel("Name:"))
-        layout.addWidget(self.name_input)
-        layout.addWidget(QLabel("Path or URL:"))
-
-        path_row = QHBoxLayout()
-        path_row.addWidget(self.path_input)
-        path_row.addWidget(browse_button)
-        layout.addLayout(path_row)
-
-        layout.addWidget(icon_button)
-        layout.addWidget(add_button)
-        self.setLayout(layout)
-
-    def browse_file(self):
-        file, _ = QFileDialog.getOpenFileName(self, "Select File")
-        if file:
-            self.path_input.setText(file)
-
-    def choose_icon(self):
-        file, _ = QFileDialog.getOpenFileName(self, "Choose Icon", filter="Images (*.png *.jpg *.bmp)")
-        if file:
-            dest = os.path.join(ICONS_DIR, os.path.basename(file))
-            shutil.copyfile(file, dest)
-            self.icon_path = dest
-
-    def accept_data(self):
-        if not self.name_input.text() or not self.path_input.text():
-            QMessageBox.warning(self, "Missing Info", "Both name and path are required.")
-            return
-        self.accept()
+from PyQt5.QtWidgets import QApplication, QWidget
+from PyQt5.QtGui import QPainter, QColor, QPixmap, QPixmapCache
+from PyQt5.QtCore import Qt, QPoint, QRect, QTimer, QPropertyAnimation, QEasingCurve, QEvent
+from screen_map import ScreenMap, clamp_into
+import tracing
+
+IMPORTED = time.perf_counter()
+
+SHORTCUTS_FILE = os.environ.get('QUICKBALL_SHORTCUTS', 'shortcuts.json')
+STARTUP_BUDGET_MS = float(os.environ.get('QUICKBALL_STARTUP_BUDGET_MS', 400))
+IDLE_DELAY_MS = 10000
+FADE_MS = 250
+IDLE_OPACITY = 0.3
+SNAP_MS = 150
+DEFAULT_REFRESH_HZ = 60
+
+class SpriteWidget(QWidget):
+    # Renders its look once per device pixel ratio, size and palette into a
+    # pixmap; every repaint after that is a single blit.
+    def __init__(self):
+        super().__init__()
+        self.sprite = None
+        self.sprite_key = None
+        self.watched_window = None
+
+    def draw_sprite(self, painter):
+        raise NotImplementedError
+
+    def sprite_pixmap(self):
+        ratio = self.devicePixelRatioF()
+        key = (ratio, self.width(), self.height(), self.palette().cacheKey(), self.font().key())
+        if key != self.sprite_key:
+            sprite = QPixmap(self.size() * ratio)
+            sprite.setDevicePixelRatio(ratio)
+            sprite.fill(Qt.transparent)
+            painter = QPainter(sprite)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setFont(self.font())
+            self.draw_sprite(painter)
+            painter.end()
+            self.sprite, self.sprite_key = sprite, key
+        return self.sprite
+
+    def invalidate_sprite(self, *args):
+        self.sprite_key = None
+        self.update()
 
-    def get_data(self):
-        return self.name_input.text(), self.path_input.text(), self.icon_path
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self.sprite_pixmap())
 
-class ShortcutPanel(QWidget):
-    def __init__(self, shortcuts, parent_ball):
-        super().__init__()
-        self.shortcuts = shortcuts
-        self.parent_ball = parent_ball
-        self.setWindowFlags(Qt.Popup)
-        self.setFixedWidth(300)
-
-        self.layout = QVBoxLayout()
-        self.setLayout(self.layout)
-
-        self.list_widget = QListWidget()
-        self.list_widget.setDragDropMode(QAbstractItemView.InternalMove)
-        self.list_widget.setDefaultDropAction(Qt.MoveAction)
-        self.list_widget.setSelectionMode(QAbstractItemView.SingleSelection)
-        self.list_widget.setSpacing(5)
-        self.list_widget.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.list_widget.customContextMenuRequested.connect(self.show_context_menu)
-        self.list_widget.itemDoubleClicked.connect(self.launch_item)
-
-        self.layout.addWidget(self.list_widget)
-
-        add_btn = QPushButton("+ Add Shortcut")
-        add_btn.clicked.connect(self.add_shortcut)
-        self.layout.addWidget(add_btn)
-
-        self.populate_list()
-        self.list_widget.model().rowsMoved.connect(self.save_reordered)
-
-    def populate_list(self):
-        self.list_widget.clear()
-        for s in self.shortcuts:
-            item = QListWidgetItem(QIcon(s.get('icon', DEFAULT_ICON)), s['name'])
-            item.setData(Qt.UserRole, s)
-            self.list_widget.addItem(item)
-
-    def save_reordered(self):
-        self.shortcuts = [self.list_widget.item(i).data(Qt.UserRole) for i in range(self.list_widget.count())]
-        self.save()
-
-    def add_shortcut(self):
-        dialog = ShortcutDialog(self)
-        if dialog.exec_():
-            name, path, icon = dialog.get_data()
-            self.shortcuts.append({'name': name, 'path': path, 'icon': icon})
-            self.save()
-            self.populate_list()
-
-    def show_context_menu(self, pos):
-        item = self.list_widget.itemAt(pos)
-        if not item:
-            return
+    def showEvent(self, event):
+        super().showEvent(event)
+        window = self.windowHandle()
+        if window is not None and window is not self.watched_window:
+            window.screenChanged.connect(self.invalidate_sprite)
+            self.watched_window = window
 
-        menu = QMenu(self)
-        edit_action = menu.addAction("Edit")
-        delete_action = menu.addAction("Delete")
-        action = menu.exec_(self.list_widget.mapToGlobal(pos))
-
-        if action == edit_action:
-            self.edit_shortcut(item)
-        elif action == delete_action:
-            self.delete_shortcut(item)
-
-    def edit_shortcut(self, item):
-        data = item.data(Qt.UserRole)
-        dialog = ShortcutDialog(self, data)
-        if dialog.exec_():
-            name, path, icon = dialog.get_data()
-            data.update({'name': name, 'path': path, 'icon': icon})
-            self.save()
-            self.populate_list()
-
-    def delete_shortcut(self, item):
-        self.shortcuts.remove(item.data(Qt.UserRole))
-        self.save()
-        self.populate_list()
-
-    def save(self):
-        with open(SHORTCUTS_FILE, 'w') as f:
-            json.dump(self.shortcuts, f, indent=2)
-
-    def launch_item(self, item):
-        data = item.data(Qt.UserRole)
-        try:
-            if data['path'].startswith("http"):
-                webbrowser.open(data['path'])
-            else:
-                os.startfile(data['path'])
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
-        self.close()
+    def changeEvent(self, event):
+        if event.type() in (QEvent.PaletteChange, QEvent.FontChange, QEvent.StyleChange):
+            self.invalidate_sprite()
+        super().changeEvent(event)
 
-class ExitZone(QWidget):
+class ExitZone(SpriteWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Exit Zone")
@@ -178,15 +75,13 @@ class ExitZone(QWidget):
         self.setAttribute(Qt.WA_TranslucentBackground)
         self.hide()
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
+    def draw_sprite(self, painter):
         painter.setBrush(QColor(255, 0, 0, 180))
         painter.setPen(Qt.white)
         painter.drawEllipse(0, 0, self.width(), self.height())
         painter.drawText(self.rect(), Qt.AlignCenter, "X")
 
-class QuickBall(QWidget):
+class QuickBall(SpriteWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Quick Ball")
@@ -198,77 +93,243 @@ class QuickBall(QWidget):
         self.dragging = False
         self.drag_start_pos = None
         self.panel = None
-
-        self.exit_zone = ExitZone()
-
-        self.opacity_timer = QTimer(self)
-        self.opacity_timer.timeout.connect(self.fade_out)
-        self.reset_opacity_timer()
+        self.store = None
+        self.save_error = False
+        self.first_paint_callbacks = []
+
+        self.exit_zone = None
+        self.screens = ScreenMap(QApplication.instance(), self)
+        QApplication.instance().aboutToQuit.connect(self.shutdown)
+
+        # Idle fading is driven by enter/leave events: one single-shot timer
+        # after the cursor leaves, and an animation only while fading.
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(IDLE_DELAY_MS)
+        self.idle_timer.timeout.connect(self.fade_out)
+        self.fade = QPropertyAnimation(self, b"windowOpacity", self)
+        self.fade.setDuration(FADE_MS)
         self.setWindowOpacity(1.0)
+        self.idle_timer.start()
+
+        # Mice report far more often than the screen refreshes: a drag moves
+        # the window at most once per frame, to the latest position seen.
+        self.drag_target = None
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setTimerType(Qt.PreciseTimer)
+        self.frame_timer.timeout.connect(self.apply_drag)
+        self.snap = QPropertyAnimation(self, b"pos", self)
+        self.snap.setDuration(SNAP_MS)
+        self.snap.setEasingCurve(QEasingCurve.OutCubic)
+
+    def shutdown(self):
+        if self.panel:
+            # Before the store flushes, so no import batch arrives after it.
+            self.panel.stop_import()
+            self.panel.close()
+            self.panel.deleteLater()
+            self.panel = None
+        if self.exit_zone:
+            self.exit_zone.deleteLater()
+        from icon_store import added, collect
+        # Only icons stored while we ran are candidates, so most quits skip this.
+        if self.store is not None and added:
+            referenced = self.store.referenced_icons()
+            # Not after a failed or partial load: icons of the entries that
+            # could not be read would look unused.
+            if self.store.intact:
+                collect(referenced)
+
+    def fade_to(self, opacity):
+        self.fade.stop()
+        if self.windowOpacity() == opacity:
+            return
+        self.fade.setStartValue(self.windowOpacity())
+        self.fade.setEndValue(opacity)
+        self.fade.start()
 
-    def reset_opacity_timer(self):
-        self.opacity_timer.start(10000)
+    def wake(self):
+        self.idle_timer.stop()
+        self.fade_to(1.0)
 
     def fade_out(self):
-        self.setWindowOpacity(0.3)
+        if not self.dragging:
+            self.fade_to(IDLE_OPACITY)
+            # Qt's pixmap cache wakes every 30 s for as long as it holds
+            # anything; whatever an idle ball needs is cheap to redraw.
+            QPixmapCache.clear()
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
+    def enterEvent(self, event):
+        self.wake()
+
+    def leaveEvent(self, event):
+        if not self.dragging:
+            self.idle_timer.start()
+
+    def draw_sprite(self, painter):
         painter.setBrush(QColor(0, 122, 204, 220))
         painter.setPen(Qt.NoPen)
         painter.drawEllipse(0, 0, self.width(), self.height())
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.first_paint_callbacks:
+            callbacks, self.first_paint_callbacks = self.first_paint_callbacks, []
+            for callback in callbacks:
+                QTimer.singleShot(0, callback)
+
+    def prewarm(self):
+        # Once the ball is up, load the store and panel code while the user
+        # has not clicked yet so the first open does not pay for it.
+        self.load_store()
+        import shortcut_panel
+
+    def load_store(self):
+        if self.store is None:
+            from shortcut_store import get_store
+            self.store = get_store(SHORTCUTS_FILE)
+            self.store.save_failed.connect(self.on_save_failed)
+            self.store.load()
+        return self.store
+
+    def on_save_failed(self, error):
+        # One message at a time; the edits stay in memory and go out with
+        # the next save that works.
+        if self.save_error:
+            return
+        from PyQt5.QtWidgets import QMessageBox
+        self.save_error = True
+        QMessageBox.critical(self, "Save Failed", f"Your shortcuts could not be saved to {self.store.path}:\n{error}")
+        self.save_error = False
+
+    def frame_interval(self):
+        screen = self.windowHandle().screen() if self.windowHandle() else QApplication.primaryScreen()
+        rate = screen.refreshRate() if screen else 0
+        return max(1, round(1000 / (rate or DEFAULT_REFRESH_HZ)))
+
+    def apply_drag(self):
+        if self.drag_target is not None:
+            self.move(self.drag_target)
+            self.drag_target = None
+            self.frame_timer.start(self.frame_interval())
+
+    def snap_to_edge(self):
+        area = self.screens.available_at(self.geometry().center())
+        inside = clamp_into(self.geometry(), area)
+        x, y = inside.x(), inside.y()
+        edges = [
+            (x - area.left(), QPoint(area.left(), y)),
+            (area.right() - (x + self.width() - 1), QPoint(area.right() - self.width() + 1, y)),
+            (y - area.top(), QPoint(x, area.top())),
+            (area.bottom() - (y + self.height() - 1), QPoint(x, area.bottom() - self.height() + 1)),
+        ]
+        target = min(edges, key=lambda edge: edge[0])[1]
+        if target != self.pos():
+            self.snap.setStartValue(self.pos())
+            self.snap.setEndValue(target)
+            self.snap.start()
+
     def mousePressEvent(self, event):
-        self.setWindowOpacity(1.0)
-        self.reset_opacity_timer()
+        self.wake()
+        self.snap.stop()
         self.drag_start_pos = event.globalPos() - self.pos()
 
         if event.button() == Qt.LeftButton:
             self.dragging = True
+            if self.exit_zone is None:
+                self.exit_zone = ExitZone()
+            area = self.screens.available_at(self.geometry().center())
+            self.exit_zone.move(area.x() + area.width() - 100, area.y() + area.height() - 100)
             self.exit_zone.show()
-            screen_geometry = QApplication.primaryScreen().geometry()
-            self.exit_zone.move(screen_geometry.width() - 100, screen_geometry.height() - 100)
 
     def mouseMoveEvent(self, event):
         if self.dragging:
-            self.move(event.globalPos() - self.drag_start_pos)
+            self.drag_target = event.globalPos() - self.drag_start_pos
+            if not self.frame_timer.isActive():
+                self.apply_drag()
 
     def mouseReleaseEvent(self, event):
-        self.setWindowOpacity(1.0)
-        self.reset_opacity_timer()
-        self.exit_zone.hide()
+        if not self.underMouse():
+            self.idle_timer.start()
+        if self.exit_zone:
+            self.exit_zone.hide()
 
         was_dragging = self.dragging
         self.dragging = False
+        self.frame_timer.stop()
+        if self.drag_target is not None:
+            self.move(self.drag_target)
+            self.drag_target = None
 
         if was_dragging:
             if self.geometry().intersects(self.exit_zone.geometry()):
                 QApplication.quit()
                 return
+            self.snap_to_edge()
         else:
             self.toggle_panel()
 
         self.drag_start_pos = None
 
+    @tracing.traced('toggle_panel')
     def toggle_panel(self):
         if self.panel and self.panel.isVisible():
             self.panel.close()
         else:
-            shortcuts = []
-            if os.path.exists(SHORTCUTS_FILE):
-                with open(SHORTCUTS_FILE, 'r') as f:
-                    try:
-                        shortcuts = json.load(f)
-                    except:
-                        pass
-            self.panel = ShortcutPanel(shortcuts, self)
-            self.panel.move(self.x() + self.width(), self.y())
+            if self.panel is None:
+                from shortcut_panel import ShortcutPanel
+                self.panel = ShortcutPanel(self.load_store(), self)
+            else:
+                self.panel.refresh()
+            self.place_panel()
             self.panel.show()
 
+    def place_panel(self):
+        # Open beside the ball on its own screen: to the right when there is
+        # room, otherwise to the left, and never past the screen's edges.
+        area = self.screens.available_at(self.geometry().center())
+        self.panel.adjustSize()
+        size = self.panel.frameGeometry().size()
+        x = self.x() + self.width()
+        if x + size.width() > area.x() + area.width():
+            x = self.x() - size.width()
+        self.panel.move(clamp_into(QRect(QPoint(x, self.y()), size), area))
+
+def report_startup(app):
+    import json
+    painted = time.perf_counter()
+    report = {
+        'import_ms': round((IMPORTED - STARTED) * 1000, 1),
+        'first_paint_ms': round((painted - STARTED) * 1000, 1),
+        'budget_ms': STARTUP_BUDGET_MS,
+    }
+    print(json.dumps(report), flush=True)
+    app.exit(0 if report['first_paint_ms'] <= STARTUP_BUDGET_MS else 1)
+
 if __name__ == '__main__':
+    # A ball is already running: hand it the command line and leave.
+    import quickball
+    command = sys.argv[1:] or ['show']
+    status = quickball.run(command)
+    if status is not None:
+        sys.exit(status)
+
     app = QApplication(sys.argv)
-    ensure_default_icon()
     window = QuickBall()
+    from daemon import Daemon
+    daemon = Daemon(window)
+    if not daemon.acquire():
+        # Another instance won the race while we were starting up.
+        status = quickball.run(command, wait=2.0)
+        sys.exit(1 if status is None else status)
+    window.first_paint_callbacks.append(daemon.serve)
+    app.aboutToQuit.connect(daemon.close)
+    if os.environ.get('QUICKBALL_STARTUP_REPORT'):
+        window.first_paint_callbacks.append(lambda: report_startup(app))
+    else:
+        window.first_paint_callbacks.append(window.prewarm)
+    if tracing.ENABLED:
+        app.aboutToQuit.connect(lambda: print(f"Trace written to {tracing.dump()}", file=sys.stderr))
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,100 @@
+import os
+import time
+import threading
+import functools
+from collections import deque
+
+# Off unless QUICKBALL_TRACE is set. When off, traced() hands back the
+# function it was given and span() a shared do-nothing object, so the
+# instrumented code runs exactly as before.
+ENABLED = bool(os.environ.get('QUICKBALL_TRACE'))
+BUFFER_EVENTS = int(os.environ.get('QUICKBALL_TRACE_EVENTS', 65536))
+
+# deque appends are atomic, so worker threads record without a lock; once
+# full, the oldest spans drop off.
+events = deque(maxlen=BUFFER_EVENTS)
+thread_names = {}
+ORIGIN = time.perf_counter_ns()
+
+
+def record(name, start, duration, args=None):
+    tid = threading.get_ident()
+    if tid not in thread_names:
+        thread_names[tid] = threading.current_thread().name
+    events.append((name, start, duration, tid, args))
+
+
+class Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, self.start, time.perf_counter_ns() - self.start, self.args)
+        return False
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name, **args):
+    if not ENABLED:
+        return NULL_SPAN
+    return Span(name, args or None)
+
+
+def traced(name=None):
+    def wrap(func):
+        if not ENABLED:
+            return func
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(label, start, time.perf_counter_ns() - start)
+        return wrapper
+    return wrap
+
+
+def chrome_trace():
+    pid = os.getpid()
+    trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+             for tid, name in list(thread_names.items())]
+    for name, start, duration, tid, args in list(events):
+        event = {'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                 'ts': (start - ORIGIN) / 1000, 'dur': duration / 1000}
+        if args:
+            event['args'] = args
+        trace.append(event)
+    return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+
+def dump(path=None):
+    import json
+    import tempfile
+    if path is None:
+        path = os.environ.get('QUICKBALL_TRACE_FILE') or os.path.join(
+            tempfile.gettempdir(), f'quickball-trace-{os.getpid()}.json')
+    with open(path, 'w') as f:
+        json.dump(chrome_trace(), f)
+    return path
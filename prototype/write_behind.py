@@ -0,0 +1,116 @@
+import os
+import sys
+import json
+import tempfile
+import threading
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from tracing import span
+
+SAVE_DELAY_MS = 400
+
+
+def atomic_write(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    # Make the rename itself durable.
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def snapshot(shortcuts):
+    # A shallow copy is a consistent snapshot: edits replace entries rather
+    # than mutate them. Folder contents are lists that do change in place.
+    return [dict(s, children=snapshot(s['children'])) if s.get('children') else s for s in shortcuts]
+
+
+def plain(obj):
+    # Shortcut records are saved as the dicts they stand for.
+    if not hasattr(obj, 'as_dict'):
+        raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+    return obj.as_dict()
+
+
+class WriteBehind(QObject):
+    saved = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path, stamp_func, delay=SAVE_DELAY_MS, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.stamp_func = stamp_func
+        self.source = None
+        self.pending = None
+        self.busy = False
+        self.written_stamp = None
+        self.cond = threading.Condition()
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.submit)
+
+        self.thread = threading.Thread(target=self.run, name='shortcut-writer', daemon=True)
+        self.thread.start()
+
+    def schedule(self, shortcuts):
+        # Bursts inside the delay window collapse into one write of the latest state.
+        self.source = shortcuts
+        self.timer.start()
+
+    def submit(self):
+        if self.source is None:
+            return
+        pending = snapshot(self.source)
+        self.source = None
+        with self.cond:
+            self.pending = pending
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while self.pending is None:
+                    self.cond.wait()
+                snapshot, self.pending = self.pending, None
+                self.busy = True
+            try:
+                with span('write_json', rows=len(snapshot)):
+                    atomic_write(self.path, json.dumps(snapshot, default=plain))
+                stamp = self.stamp_func(self.path)
+                self.written_stamp = stamp
+                self.saved.emit(stamp)
+            except Exception as e:
+                # Anything else would end the thread, and flush() would wait
+                # for it forever.
+                print(f"Failed to save {self.path}: {e}", file=sys.stderr)
+                self.failed.emit(str(e))
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
+
+    def is_idle(self):
+        return not self.timer.isActive() and self.pending is None and not self.busy
+
+    def flush(self):
+        if self.timer.isActive():
+            self.timer.stop()
+            self.submit()
+        with self.cond:
+            while self.pending is not None or self.busy:
+                self.cond.wait()